@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import List, Tuple
+import atexit
+import queue
+import threading
+
+import components.history
+import components.savegame
+import util.texts as util
+
+PREFIX = 'autosave_round_'
+
+
+class AutosaveWriter():
+    def __init__(self, directory: Path = Path('temp'), keep: int = None, compression: int = 0,
+                 history_interval: int = 10) -> None:
+        self.directory = directory
+        self.keep = keep
+        self.compression = compression
+        # every round is also appended to the save history, which --keep-saves does not prune
+        self.history = components.history.SaveHistory(
+            directory / 'history', history_interval) if history_interval else None
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: threading.Thread = None
+        # saves in the order this writer wrote them
+        self.written: List[Path] = []
+
+    def submit(self, game_round: int, data: bytes) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run, name='autosave', daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+        self.queue.put((game_round, data))
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self.write(*item)
+            except Exception as error:  # pylint: disable=W0703
+                # the thread has to survive, flush waits for every item
+                print(util.format_info(f'Autosave failed: {error}'))
+            finally:
+                self.queue.task_done()
+
+    def write(self, game_round: int, data: bytes) -> None:
+        path = self.directory / f'{PREFIX}{game_round}{components.savegame.SUFFIX}'
+        components.savegame.write(path, data, self.compression)
+        if path in self.written:
+            self.written.remove(path)
+        self.written.append(path)
+        if self.history is not None:
+            self.history.append(game_round, data)
+        if self.keep:
+            for old_path in self.saves()[:-self.keep]:
+                old_path.unlink()
+
+    def saves(self) -> List[Path]:
+        # oldest first by write order, not by round: after loading an older round the newest saves have the
+        # lowest rounds. saves of earlier runs come first, ordered by modification time
+        saves: List[Tuple[int, int, Path]] = []
+        for path in self.directory.glob(f'{PREFIX}*{components.savegame.SUFFIX}'):
+            game_round = path.name[len(PREFIX):-len(components.savegame.SUFFIX)]
+            if game_round.isdigit():
+                order = self.written.index(path) if path in self.written else -1
+                saves.append((order, path.stat().st_mtime_ns, path))
+        return [path for _, _, path in sorted(saves)]
+
+    def flush(self) -> None:
+        self.queue.join()
+
+    def close(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+WRITER: AutosaveWriter = None
+
+
+def configure(directory: Path = Path('temp'), keep: int = None, compression: int = 0,
+              history_interval: int = 10) -> AutosaveWriter:
+    global WRITER  # pylint: disable=W0603
+    if WRITER is not None:
+        WRITER.close()
+    WRITER = AutosaveWriter(directory, keep, compression, history_interval)
+    return WRITER
+
+
+def writer() -> AutosaveWriter:
+    return WRITER if WRITER is not None else configure()
@@ -1,8 +1,15 @@
-from typing import Tuple
+from __future__ import annotations
+from typing import Dict, Iterator, List, Tuple
+
+STATE = ('id', 'name', 'value', 'max_count', 'calamity',
+         'tradeable', 'offerable', 'additional_set', 'last_owner')
 
 
 class Card():
-    def __init__(self, name: str, value: int, max_count: int, additional_set: bool, calamity: str = None, tradeable: bool = True, offerable: bool = True) -> None:
+    __slots__ = STATE + ('set_values', 'card_values')
+
+    def __init__(self, name: str, value: int, max_count: int, additional_set: bool, calamity: str = None, tradeable: bool = True, offerable: bool = True, card_id: int = -1) -> None:
+        self.id = card_id
         self.name = name
         self.value = value
         self.max_count = max_count
@@ -11,6 +18,24 @@ class Card():
         self.offerable = offerable
         self.additional_set = additional_set
         self.last_owner = None
+        self.prepare_tables()
+
+    def prepare_tables(self) -> None:
+        # value of the set and of one more card for every count a hand can hold
+        counts = range(max(self.max_count, 0) + 1)
+        self.set_values = tuple(count * count * self.value for count in counts)
+        self.card_values = tuple(count * self.value if count == self.max_count else (2 * count + 1) * self.value
+                                 for count in counts)
+
+    def set_value(self, count: int) -> int:
+        if count <= self.max_count:
+            return self.set_values[count]
+        return count * count * self.value
+
+    def card_value(self, count: int) -> int:
+        if count <= self.max_count:
+            return self.card_values[count]
+        return (2 * count + 1) * self.value
 
     def is_commodity(self) -> bool:
         return not self.is_calamity()
@@ -33,8 +58,44 @@ class Card():
     def order_calamity(self) -> Tuple[str, int, bool]:
         return (self.calamity, self.value, not self.tradeable)
 
+    def __getstate__(self) -> Dict:
+        return {key: getattr(self, key) for key in STATE}
+
+    def __setstate__(self, state: Dict) -> None:
+        # cards of older saves have neither an id nor value tables
+        self.id = -1
+        self.last_owner = None
+        for key, value in state.items():
+            setattr(self, key, value)
+        self.prepare_tables()
+
     def __repr__(self) -> str:
         return self.__str__()
 
     def __str__(self) -> str:
         return f'{self.name}({self.value})'
+
+
+class CardRegistry():
+    # every card type gets a dense id, water always has id 0
+    def __init__(self, water: Card = None) -> None:
+        self.cards: List[Card] = []
+        self.water = self.add(water) if water is not None else self.register('water', 0, 0, False)
+
+    def register(self, name: str, value: int, max_count: int, additional_set: bool, calamity: str = None, tradeable: bool = True, offerable: bool = True) -> Card:
+        return self.add(Card(name, value, max_count, additional_set, calamity, tradeable, offerable))
+
+    def add(self, card: Card) -> Card:
+        card.id = len(self.cards)
+        card.prepare_tables()
+        self.cards.append(card)
+        return card
+
+    def __getitem__(self, card_id: int) -> Card:
+        return self.cards[card_id]
+
+    def __iter__(self) -> Iterator[Card]:
+        return iter(self.cards)
+
+    def __len__(self) -> int:
+        return len(self.cards)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, List, Tuple
+import hashlib
+import json
+import os
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / 'config.conf'
+CACHE_DIR = Path(__file__).resolve().parent.parent.parent / 'temp' / 'decks'
+FORMAT = 1
+
+# name, value, count, additional_set, calamity, tradeable, offerable
+CardEntry = Tuple[str, int, int, bool, str, bool, bool]
+
+CARD_FIELDS = {
+    'name': str, 'value': int, 'count': int, 'additional_set': bool,
+    'calamity': (str, type(None)), 'tradeable': bool, 'offerable': bool, 'map': str, 'players': list,
+}
+CIVILIZATION_FIELDS = {'name': str, 'ast_ranking': int, 'players': list}
+
+
+class DeckDefinition():
+    # the cards and civilizations of one player count and map, compiled from the config
+    def __init__(self, config_hash: str, playercount: int, game_map: str, cards: List[CardEntry],
+                 stacks: Dict[int, List[int]], civilizations: List[Tuple[str, int]]) -> None:
+        self.config_hash = config_hash
+        self.playercount = playercount
+        self.map = game_map
+        # every card of the config in order, so card ids do not depend on player count and map
+        self.cards = cards
+        # stack key -> indices into cards, one per physical card
+        self.stacks = stacks
+        self.civilizations = civilizations
+
+    def to_dict(self) -> Dict:
+        return {
+            'format': FORMAT,
+            'config_hash': self.config_hash,
+            'playercount': self.playercount,
+            'map': self.map,
+            'cards': self.cards,
+            'stacks': list(self.stacks.items()),
+            'civilizations': self.civilizations,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> DeckDefinition:
+        return cls(data['config_hash'], data['playercount'], data['map'],
+                   [tuple(card) for card in data['cards']],
+                   {key: indices for key, indices in data['stacks']},
+                   [tuple(civilization) for civilization in data['civilizations']])
+
+
+def validate_item(item: Dict, fields: Dict, kind: str) -> None:
+    for field, types in fields.items():
+        if field not in item:
+            raise ValueError(f'{kind} {item.get("name")} lacks {field}')
+        if not isinstance(item[field], types):
+            raise ValueError(f'{kind} {item.get("name")} has an invalid {field}: {item[field]!r}')
+
+
+def compile_deck(config: Dict, config_hash: str, playercount: int, game_map: str) -> DeckDefinition:
+    cards = []
+    stacks: Dict[int, List[int]] = {}
+    names = set()
+    for index, item in enumerate(config['cards']):
+        validate_item(item, CARD_FIELDS, 'card')
+        cards.append((item['name'], item['value'], item['count'], item['additional_set'],
+                      item['calamity'], item['tradeable'], item['offerable']))
+        if item['map'] != game_map or playercount not in item['players']:
+            continue
+        if item['name'] in names:
+            raise ValueError(f'card {item["name"]} appears twice for {playercount} players on the {game_map} map')
+        if item['count'] < 1 or abs(item['value']) not in range(1, 10):
+            raise ValueError(f'card {item["name"]} needs a count of at least 1 and a value of 1 to 9')
+        names.add(item['name'])
+        stacks.setdefault(abs(item['value']), []).extend([index] * item['count'])
+    if not stacks:
+        raise ValueError(f'the config has no cards for {playercount} players on the {game_map} map')
+
+    civilizations = []
+    for item in config['civilizations']:
+        validate_item(item, CIVILIZATION_FIELDS, 'civilization')
+        if playercount in item['players']:
+            civilizations.append((item['name'], item['ast_ranking']))
+    if len(civilizations) != playercount:
+        raise ValueError(f'the config has {len(civilizations)} civilizations for {playercount} players')
+
+    return DeckDefinition(config_hash, playercount, game_map, cards, stacks, civilizations)
+
+
+DECKS: Dict[Tuple[str, int, str], DeckDefinition] = {}
+
+
+def get_deck(playercount: int, game_map: str, path: Path = CONFIG_PATH) -> DeckDefinition:
+    # compiled decks are cached in memory and on disk under the hash of the config
+    data = path.read_bytes()
+    config_hash = hashlib.sha256(data).hexdigest()
+    key = (config_hash, playercount, game_map)
+    if key in DECKS:
+        return DECKS[key]
+
+    cache = CACHE_DIR / f'{config_hash[:16]}_{playercount}_{game_map}.json'
+    deck = None
+    if cache.exists():
+        try:
+            cached = json.loads(cache.read_text(encoding='utf-8'))
+            if cached.get('format') == FORMAT and cached.get('config_hash') == config_hash:
+                deck = DeckDefinition.from_dict(cached)
+        except (OSError, ValueError, KeyError, TypeError):
+            deck = None
+    if deck is None:
+        deck = compile_deck(json.loads(data.decode('utf-8')), config_hash, playercount, game_map)
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            temp = cache.with_name(f'.{cache.name}.{os.getpid()}.tmp')
+            temp.write_text(json.dumps(deck.to_dict()), encoding='utf-8')
+            os.replace(temp, cache)
+        except OSError:
+            pass
+
+    DECKS[key] = deck
+    return deck
+
+
+def get_maps(path: Path = CONFIG_PATH) -> List[str]:
+    with open(path, encoding='utf-8') as config:
+        return sorted({card['map'] for card in json.load(config)['cards']})
@@ -1,34 +1,33 @@
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple
 import random
-import json
-from pathlib import Path
 
-import jsonpickle
-
-from components.card import Card
+from components.card import Card, CardRegistry
+from components.deck import DeckDefinition
+from components.handcards import VALUATIONS
 from components.player import Player, evaluate
+from components.stacks import TradeStacks
+import components.autosave
+import components.savegame
+import components.trade_composer
+import components.trade_matching
+import components.trade_matrix
+import util.events as events
 import util.texts as util
 import util.interaction as Requests
+import util.profiling as profiling
 
 
 def print_step() -> None:
-    print('____________________________________________________________')
+    util.write(util.GAME_INFO, '____________________________________________________________')
 
 
-def get_cards_from_config(cards: Dict, options: Dict) -> Dict[int, List[Card]]:
-    stacks = {}
-    for item in cards:
-        if options.playercount in item['players']:
-            card = [Card(item['name'], item['value'], item['count'], item['additional_set'], item['calamity'],
-                         item['tradeable'], item['offerable'])] * item['count']
-            if abs(item['value']) in stacks:
-                stacks[abs(item['value'])].extend(card)
-            else:
-                stacks[abs(item['value'])] = card
-    return stacks
+def get_cards_from_deck(deck: DeckDefinition, registry: CardRegistry) -> Dict[int, List[Card]]:
+    # every card of the config gets an id, so ids are the same for all player counts and maps
+    cards = [registry.register(*entry) for entry in deck.cards]
+    return {key: [cards[index] for index in indices] for key, indices in deck.stacks.items()}
 
 
-def prepare_stacks(stacks: Dict[int, List[Card]], options: Dict) -> None:
+def prepare_stacks(stacks: Dict[int, List[Card]], options: Dict, rng: random.Random = random) -> None:
     for key, stack in stacks.items():
         basic_commodities = list(
             filter(lambda x: x.is_commodity() and not x.is_additional_set(), stack))
@@ -44,40 +43,49 @@ def prepare_stacks(stacks: Dict[int, List[Card]], options: Dict) -> None:
         if options.playercount in range(5, 9):
 
             # set aside as many cards as there are players from basic commodities
-            top_stack = random.sample(
+            top_stack = rng.sample(
                 basic_commodities, options.playercount)
             for card in top_stack:
                 basic_commodities.remove(card)
 
             # shuffle remaining cards and calamities
             middle_stack = basic_commodities + major_calamities
-            random.shuffle(middle_stack)
+            rng.shuffle(middle_stack)
 
         elif options.playercount in range(9, 10):
             top_stack = basic_commodities + minor_calamities
-            random.shuffle(top_stack)
+            rng.shuffle(top_stack)
 
             middle_stack = additional_commodities + major_calamities
-            random.shuffle(middle_stack)
+            rng.shuffle(middle_stack)
 
         stacks[key] = top_stack + middle_stack + non_tradeable_calamities
 
 
 class Game():
-    def __init__(self, config: Dict, options: Dict) -> None:
-        self.stacks = {1: [], 2: [], 3: [], 4: [],
-                       5: [], 6: [], 7: [], 8: [], 9: []}
+    def __init__(self, deck: DeckDefinition, options: Dict) -> None:
+        self.init_state()
+        self.seed = options.seed
+        self.rng = random.Random(self.seed)
 
-        stacks = get_cards_from_config(config['cards'], options)
-        prepare_stacks(stacks, options)
+        stacks = get_cards_from_deck(deck, self.cards)
+        prepare_stacks(stacks, options, self.rng)
         self.add_cards_to_stacks(stacks)
 
-        self.prepare_civilizations_from_config(
-            config['civilizations'], options)
+        self.prepare_civilizations(deck.civilizations)
+
+        self.apply_options(options)
+
+    def init_state(self) -> None:
+        self.players: List[Player] = []
+        self.seed: int = None
+        self.rng = random.Random()
 
         self.round = 1
         self.hand_limit = 8
-        self.water = Card('water', 0, 0, False)
+        self.cards = CardRegistry()
+        self.water = self.cards.water
+        self.stacks = TradeStacks(self.water)
 
         self.discard_pile: List[Card] = []
         self.calamities: Dict[Card, Player] = {}
@@ -87,178 +95,358 @@ class Game():
         self.resolve_trade_routes = False
 
         self.trading_queue: List[Player] = []
+        # trade settings, the threshold can be overridden per player name
+        self.priority_threshold = 0.5
+        self.priority_thresholds: Dict[str, float] = {}
+        self.trade_budget = 1000
+        self.trade_engine = 'queue'
+        # greedy: Player.trade, beam: components.trade_composer with a deadline per trade in seconds (0 for none)
+        self.trade_composer = 'greedy'
+        self.trade_beam_width = 8
+        self.trade_deadline = 0.0
+        # scoring processes of the parallel engine, None for one per core
+        self.trade_workers: int = None
+        self.trade_matrix: components.trade_matrix.TradeMatrix = None
+        # (actor, other) -> (actor version, other version, offer, trade of the beam composer) of the last evaluation
+        self.offer_cache: Dict[Tuple[Player, Player], Tuple[int, int, Tuple[Player, List[Card], List[Card], int],
+                                                            components.trade_composer.Composition]] = {}
 
         self.dispatch_calamity_resolution = {
             "Banditry": self.resolve_banditry,
             "Corruption": self.resolve_corruption,
         }
 
-    def prepare_civilizations_from_config(self, civilizations: Dict, options: Dict) -> None:
+    def apply_options(self, options: Dict) -> None:
+        self.trade_engine = options.trade_engine
+        # tools build their options without the composer settings
+        self.trade_composer = getattr(options, 'trade_composer', 'greedy')
+        self.trade_beam_width = getattr(options, 'trade_beam_width', 8)
+        self.trade_deadline = getattr(options, 'trade_deadline', 0.0) / 1000
+        self.trade_workers = getattr(options, 'trade_workers', None)
+
+    def prepare_civilizations(self, civilizations: List[Tuple[str, int]]) -> None:
         self.players: List[Player] = []
-        for item in civilizations:
-            if options.playercount in item['players']:
-                self.players.append(
-                    Player(item['name'], item['ast_ranking'], []))
+        for name, ast_ranking in civilizations:
+            self.players.append(Player(name, ast_ranking, []))
 
     def add_cards_to_stacks(self, stacks: Dict[int, List[Card]]) -> None:
-        for key, cards in stacks.items():
-            self.add_cards_to_stacks_by_key(cards, key)
+        self.stacks.add_stacks(stacks)
 
     def add_cards_to_stacks_by_key(self, cards: List[Card], key: int) -> None:
-        self.stacks[key].extend(cards)
+        self.stacks.add_cards(cards, key)
 
     def enter_cities(self, cities: int = None) -> None:
         for player in self.players:
-            player.cities = Requests.get_digit(
-                f'{player.name}:') if cities is None else cities
+            player.cities = Requests.PROVIDER.cities(
+                self, player) if cities is None else cities
 
     def prepare_trading_queue(self) -> None:
         self.trading_queue = sorted(
             self.players, key=lambda x: x.order_ast_position())
 
         for player in self.players:
-            player.priority_threshold = 0.5
+            player.priority_threshold = self.priority_thresholds.get(player.name, self.priority_threshold)
             player.calc_offer()
 
-    def perform_trade(self) -> bool:
-        actor = self.trading_queue.pop(0)
+        if self.trade_matrix is not None:
+            self.trade_matrix.close()
+            self.trade_matrix = None
+        # the beam composer screens every pair itself, the greedy scores of a matrix would pick partners it rejects
+        scored = self.trade_composer == 'greedy'
+        if scored and self.trade_engine == 'parallel' and components.trade_matrix.available():
+            # the pool and shared memory modules take a third of the startup time, only this engine imports them
+            from components.trade_parallel import SharedTradeMatrix  # pylint: disable=C0415
+            self.trade_matrix = SharedTradeMatrix(self.players, self.trade_workers)
+        elif scored and self.trade_engine == 'matrix' and components.trade_matrix.available():
+            self.trade_matrix = components.trade_matrix.TradeMatrix(self.players)
+
+        self.offer_cache = {}
+
+    def is_clean(self, actor: Player, other_player: Player) -> bool:
+        entry = self.offer_cache.get((actor, other_player))
+        return entry is not None and entry[0] == actor.version and entry[1] == other_player.version
+
+    def evaluate_offer(self, actor: Player, other_player: Player) -> Tuple[Player, List[Card], List[Card], int]:
+        if self.is_clean(actor, other_player):
+            offer = self.offer_cache[(actor, other_player)][2]
+        else:
+            profiling.PROFILER.count('evaluate_offer calls')
+            offer = actor.evaluate_offer(other_player)
+            composition = None
+            if offer is not None and self.trade_composer == 'beam':
+                offer, composition = self.screen_offer(actor, offer)
+            self.offer_cache[(actor, other_player)] = (
+                actor.version, other_player.version, offer, composition)
+        if offer is None:
+            return None
+        # Player.trade consumes the option lists
+        return (offer[0], list(offer[1]), list(offer[2]) if offer[2] is not None else None, offer[3])
+
+    def screen_offer(self, actor: Player, offer: Tuple[Player, List[Card], List[Card], int]) -> Tuple[Tuple[Player, List[Card], List[Card], int], components.trade_composer.Composition]:
+        # pairs the beam composer finds no acceptable trade for are not offered, the others are valued by its trade
+        composition = components.trade_composer.compose(actor, offer, self.trade_beam_width, self.trade_deadline)
+        if composition is None:
+            return None, None
+        return (offer[0], offer[1], offer[2], composition[0]), composition
+
+    def composition(self, actor: Player, other_player: Player) -> components.trade_composer.Composition:
+        # the trade that was scored for the pair, searched again if either hand changed since
+        if not self.is_clean(actor, other_player):
+            self.evaluate_offer(actor, other_player)
+        return self.offer_cache[(actor, other_player)][3]
+
+    def restamp(self, old_versions: Dict[Player, int]) -> None:
+        # a rolled back trade bumps the versions but leaves hands, priority and offer as they were
+        pairs = {pair for player in old_versions for other_player in self.players
+                 for pair in ((player, other_player), (other_player, player))}
+        for actor, other_player in pairs:
+            entry = self.offer_cache.get((actor, other_player))
+            if entry is not None and entry[0] == old_versions.get(actor, actor.version) and \
+                    entry[1] == old_versions.get(other_player, other_player.version):
+                self.offer_cache[(actor, other_player)] = (
+                    actor.version, other_player.version, *entry[2:])
+        if self.trade_matrix is not None:
+            self.trade_matrix.restamp(old_versions)
+
+    def find_trade_option(self, actor: Player) -> Tuple[Player, List[Card], List[Card], int]:
+        if self.trade_matrix is not None:
+            self.trade_matrix.refresh()
+            other_player = self.trade_matrix.best_partner(actor, self.trading_queue)
+            return self.evaluate_offer(actor, other_player) if other_player is not None else None
+
         max_value: Tuple[Player, List[Card], List[Card], int] = None
         for other_player in self.trading_queue:
-            offer = actor.evaluate_offer(other_player)
+            offer = self.evaluate_offer(actor, other_player)
             if max_value is None and offer is not None:
                 max_value = offer
             elif offer is not None and offer[3] > max_value[3]:  # pylint: disable=E1136  # pylint/issues/3139
                 max_value = offer
+        return max_value
+
+    def perform_trade(self) -> bool:
+        actor = self.trading_queue.pop(0)
+        # nothing changed since the actor's last attempt, so it would end the same way again
+        if all(self.is_clean(actor, other_player) for other_player in self.trading_queue):
+            max_value = None
+        else:
+            max_value = self.find_trade_option(actor)
 
         self.trading_queue.append(actor)
 
         if max_value is not None:
-            if actor.trade(max_value):
-                if self.round in actor.trades:
-                    actor.trades[self.round] += 1
-                else:
-                    actor.trades[self.round] = 1
-                return True
-            return False
+            return self.execute_trade(actor, max_value)
+        return False
+
+    def execute_trade(self, actor: Player, trade_option: Tuple[Player, List[Card], List[Card], int]) -> bool:
+        other_player = trade_option[0]
+        old_versions = {actor: actor.version, other_player: other_player.version}
+        before = {actor: evaluate(actor.handcards), other_player: evaluate(other_player.handcards)}
+        # Player.trade pops the options, a failed trade is logged with the cards it was offered
+        options = (list(trade_option[1]), list(trade_option[2]) if trade_option[2] is not None else None)
+        profiling.PROFILER.count('trade attempts')
+        if self.trade_composer == 'beam':
+            composition = self.composition(actor, other_player)
+            trade = components.trade_composer.execute(
+                actor, other_player, composition[1]) if composition is not None else None
+        else:
+            trade = actor.trade(trade_option)
+        if trade is not None:
+            profiling.PROFILER.count('successful trades')
+            if self.round in actor.trades:
+                actor.trades[self.round] += 1
+            else:
+                actor.trades[self.round] = 1
+            if events.LOG is not None:
+                trader, partner, gained, given = trade
+                events.emit(self.seed, self.round, 'trade', trader.name, partner.name, gained, given, (
+                    before[trader], evaluate(trader.handcards), before[partner], evaluate(partner.handcards)))
+            return True
+        profiling.PROFILER.count('rolled back trades')
+        self.restamp(old_versions)
+        if events.LOG is not None:
+            events.emit(self.seed, self.round, 'failed_trade', actor.name, other_player.name,
+                        options[0], options[1], (before[actor], None, before[other_player], None))
         return False
 
-    def discard_excess_calamities(self, calamities: List[Card], threshold: int) -> None:
+    def find_trade_matching(self, failed: Dict[Tuple[Player, Player], Tuple[int, int]]) -> List[Tuple[Player, Tuple[Player, List[Card], List[Card], int]]]:
+        # one edge per pair of players, weighted with the better of both directions
+        options = {}
+        for first, actor in enumerate(self.players):
+            for second in range(first + 1, len(self.players)):
+                other_player = self.players[second]
+                for trader, partner in ((actor, other_player), (other_player, actor)):
+                    if failed.get((trader, partner)) == (trader.version, partner.version):
+                        continue
+                    offer = self.evaluate_offer(trader, partner)
+                    if offer is not None and ((first, second) not in options or offer[3] > options[(first, second)][1][3]):
+                        options[(first, second)] = (trader, offer)
+
+        matching = components.trade_matching.max_weight_matching(
+            len(self.players), {edge: option[1][3] for edge, option in options.items()})
+        return sorted([options[edge] for edge in matching], key=lambda x: x[1][3], reverse=True)
+
+    def trade_by_matching(self, trades: int) -> Tuple[int, int]:
+        # trade a maximum-weight set of disjoint pairs at once, until no pair is left that could trade
+        iterations = 0
+        successes = 0
+        # pairs whose trade was rolled back, with the versions it failed at
+        failed: Dict[Tuple[Player, Player], Tuple[int, int]] = {}
+        seen = set()
+        while iterations < trades:
+            # trades can pass cards back and forth, stop once all hands were like this before
+            hands = tuple(player.handcards.signature() for player in self.players)
+            if hands in seen:
+                break
+            seen.add(hands)
+            matching = self.find_trade_matching(failed)
+            if not matching:
+                break
+            for actor, trade_option in matching[:trades - iterations]:
+                iterations += 1
+                other_player = trade_option[0]
+                old_versions = {actor: actor.version, other_player: other_player.version}
+                if self.execute_trade(actor, trade_option):
+                    successes += 1
+                    continue
+                # the rollback bumped the versions but left the hands, earlier failures still hold
+                for pair, versions in failed.items():
+                    failed[pair] = tuple(player.version if old_versions.get(player) == version else version
+                                         for player, version in zip(pair, versions))
+                failed[(actor, other_player)] = (actor.version, other_player.version)
+        return successes, iterations
+
+    def discard_excess_calamities(self, player: Player, calamities: List[Card], threshold: int) -> None:
         while len(calamities) > threshold:
-            card = random.choice(calamities)
+            card = self.rng.choice(calamities)
             calamities.remove(card)
             self.discard_pile.append(card)
+            events.emit(self.seed, self.round, 'discard', player.name, given=[card], detail='excess calamity')
+
+    def discard(self, player: Player, cards: List[Card], detail: str, before: int) -> None:
+        self.discard_pile += cards
+        if cards:
+            events.emit(self.seed, self.round, 'discard', player.name, given=cards,
+                        values=(before, evaluate(player.handcards), None, None), detail=detail)
 
     def discard_calamities(self, player: Player, calamities: List[Card]) -> None:
         majors = [x for x in calamities if x.calamity == 'major']
         minors = [x for x in calamities if x.calamity == 'minor']
 
-        self.discard_excess_calamities(majors, 2)
+        self.discard_excess_calamities(player, majors, 2)
         calamities = majors + minors
-        self.discard_excess_calamities(calamities, 3)
+        self.discard_excess_calamities(player, calamities, 3)
 
         for calamity in calamities:
             self.calamities[calamity] = player
+            events.emit(self.seed, self.round, 'calamity', player.name, gained=[calamity],
+                        other=str(calamity.last_owner) if calamity.last_owner else None, detail=calamity.name)
 
     def resolve_banditry(self, player: Player) -> None:
-        print(util.format_info(
-            'You have to discard 2 cards. You can prevent each card by paying 4 treasury token each.'))
+        util.info('You have to discard 2 cards. You can prevent each card by paying 4 treasury token each.')
         player.print_handcards(self.trailing_str)
-        count = 2 - \
-            Requests.get_digit('How many cards do you want to prevent?\n')
+        before = evaluate(player.handcards)
+        count = 2 - Requests.PROVIDER.prevented_banditry(self, player)
         cards = []
 
-        while len(cards) < count:
-            print(util.format_info(
-                f'You have to discard {count - len(cards)} more cards'))
-            player.discard_cards(cards, self.trailing_str)
+        while len(cards) < count and len(player.handcards) > 0:
+            util.info(f'You have to discard {count - len(cards)} more cards')
+            Requests.PROVIDER.discard_cards(
+                self, player, cards, self.trailing_str, count=count - len(cards))
 
-        self.discard_pile += cards
+        self.discard(player, cards, 'banditry', before)
 
     def resolve_corruption(self, player: Player) -> None:
-        face_value = Requests.get_digit(
-            'Please type in actual face value to discard. Base:10, Law:-5, Coinage:+5, Wonder of the World:+5\n')
-        print(util.format_info(
-            f'You have to discard cards with a face value of {face_value}'))
+        face_value = Requests.PROVIDER.corruption_face_value(self, player)
+        util.info(f'You have to discard cards with a face value of {face_value}')
+        before = evaluate(player.handcards)
         cards = []
 
         discard_value = 0
 
-        while discard_value < face_value:
-            print(util.format_info(
-                f'You have to discard {face_value - discard_value} additional face value'))
-            player.discard_cards(cards, self.trailing_str)
+        while discard_value < face_value and len(player.handcards) > 0:
+            util.info(f'You have to discard {face_value - discard_value} additional face value')
+            Requests.PROVIDER.discard_cards(
+                self, player, cards, self.trailing_str, face_value=face_value - discard_value)
             discard_value = sum([card.value for card in cards])
 
-        self.discard_pile += cards
+        self.discard(player, cards, 'corruption', before)
 
     def draw_card_from_stack(self, value: int) -> Card:
-        return self.stacks[value].pop(
-            0) if self.stacks[value] else self.water
+        return self.stacks.draw(value)
 
     def ask_player_to_purchase_card(self, player: Player) -> int:
-        options = [key for key, stack in self.stacks.items() if len(stack) > 0]
-        print(util.format_info(f'{player.name}:'))
-        value = Requests.get_digit(
-            f'{self.trailing_str}Please type value of card that you want to purchase.\nValid options: {options}')
-        return value if value != 0 else None
+        return Requests.PROVIDER.purchase(self, player, self.stacks.options())
+
+    def phases(self) -> List[Callable[[], None]]:
+        return [
+            self.phase_1_tax_collection,
+            self.phase_2_population_expansion,
+            self.phase_3_movement,
+            self.phase_4_conflict,
+            self.phase_5_city_construction,
+            self.phase_6_trade_card_acquisition,
+            self.phase_7_trade,
+            self.phase_8_calamity_selection,
+            self.phase_9_calamity_resolution,
+            self.phase_10_special_abilities,
+            self.phase_11_remove_surplus_populations,
+            self.phase_12_civilization_advances_acquisition,
+            self.phase_13_ast_alteration,
+        ]
 
     def game_loop(self) -> None:
-        print(util.format_game_info(
-            f'\nGAME_INFO: Round {self.round} starts: '))
+        profiler = profiling.PROFILER
+        profiler.start_round()
+        valuations = VALUATIONS.hits + VALUATIONS.misses
+        util.game_info(f'\nGAME_INFO: Round {self.round} starts: ')
         print_step()
-        self.phase_1_tax_collection()
-        self.phase_2_population_expansion()
-        self.phase_3_movement()
-        self.phase_4_conflict()
-        self.phase_5_city_construction()
-        self.phase_6_trade_card_acquisition()
-        self.phase_7_trade()
-        self.phase_8_calamity_selection()
-        self.phase_9_calamity_resolution()
-        self.phase_10_special_abilities()
-        self.phase_11_remove_surplus_populations()
-        self.phase_12_civilization_advances_acquisition()
-        self.phase_13_ast_alteration()
+        for phase in self.phases():
+            with profiler.phase(phase.__name__):
+                phase()
+            util.flush()
         self.next_round()
         print_step()
-        self.save_game()
+        with profiler.phase('save_game'):
+            self.save_game()
+        profiler.count('valuation lookups', VALUATIONS.hits + VALUATIONS.misses - valuations)
+        profiler.end_round(self.round - 1)
+        util.flush()
 
     def phase_1_tax_collection(self) -> None:
-        print(util.format_game_info('GAME_INFO: tax collection'))
+        util.game_info('GAME_INFO: tax collection')
         Requests.wait_for_action('Please collect the taxes')
         Requests.wait_for_action('Are there any tax revolts?')
 
     def phase_2_population_expansion(self) -> None:
-        print(util.format_game_info('GAME_INFO: population expansion'))
+        util.game_info('GAME_INFO: population expansion')
         Requests.wait_for_action('Please expand the populations')
         Requests.wait_for_action('Please do the census')
 
     def phase_3_movement(self) -> None:
-        print(util.format_game_info('GAME_INFO: movement'))
+        util.game_info('GAME_INFO: movement')
         Requests.wait_for_action('Please move in census order')
 
     def phase_4_conflict(self) -> None:
-        print(util.format_game_info('GAME_INFO: conflict'))
+        util.game_info('GAME_INFO: conflict')
         Requests.wait_for_action('Resolution of token conflicts')
 
-        print(util.format_info('Resolution of city attacks'))
+        util.info('Resolution of city attacks')
         attacker, defender = Requests.get_players(
             'Please name attacker and defender separated by a comma:\n', self.players)
         while attacker is not None and defender is not None:
-            attacker.draw_card(defender, self.trailing_str)
+            attacker.draw_card(defender, self.rng)
             attacker, defender = Requests.get_players(
                 'Please name attacker and defender separated by a comma:\n', self.players)
 
     def phase_5_city_construction(self) -> None:
-        print(util.format_game_info('GAME_INFO: city construction'))
+        util.game_info('GAME_INFO: city construction')
         Requests.wait_for_action('Construct cities')
         Requests.wait_for_action('Surplus population removal')
         Requests.wait_for_action('Check city support')
 
     def phase_6_trade_card_acquisition(self) -> None:
-        print(util.format_game_info('GAME_INFO: Trade card acquisition'))
-        print(util.format_info(
-            'Please enter number of cities for each nation (or leave blank for 0)'))
+        util.game_info('GAME_INFO: Trade card acquisition')
+        util.info('Please enter number of cities for each nation (or leave blank for 0)')
         self.enter_cities()
         # drawing regular trade cards
         for player in sorted(self.players, key=lambda x: x.order_cities()):
@@ -274,26 +462,51 @@ class Game():
                 player.handcards.append(self.draw_card_from_stack(value))
                 value = self.ask_player_to_purchase_card(player)
 
-    def phase_7_trade(self, trades: int = 1000) -> None:
-        print(util.format_game_info('GAME_INFO: resolving trades'))
-        self.prepare_trading_queue()
+    def trade_by_queue(self, trades: int) -> Tuple[int, int]:
         counter = 0
-        for _ in range(trades):
+        iterations = 0
+        successes = 0
+        # stop as soon as every player had a turn without any trade happening
+        while iterations < trades and counter < len(self.trading_queue):
+            iterations += 1
             val = self.perform_trade()
             if not val:
 
                 counter += 1
             else:
                 counter = 0
+                successes += 1
+        return successes, iterations
+
+    def phase_7_trade(self, trades: int = None) -> int:
+        util.game_info('GAME_INFO: resolving trades')
+        trades = self.trade_budget if trades is None else trades
+        self.prepare_trading_queue()
+        try:
+            if self.trade_engine == 'matching':
+                successes, iterations = self.trade_by_matching(trades)
+            else:
+                successes, iterations = self.trade_by_queue(trades)
+        finally:
+            # the shared buffer of the parallel engine is released even if the phase is interrupted
+            if self.trade_matrix is not None:
+                self.trade_matrix.close()
+            self.trade_matrix = None
+            self.offer_cache = {}
+        hand_value = sum(evaluate(player.handcards) for player in self.players)
+        util.info(
+            f'{self.trailing_str}{successes} trades in {iterations} of {trades} iterations, '
+            f'total hand value {hand_value}')
+        return iterations
 
     def phase_8_calamity_selection(self) -> None:
-        print(util.format_game_info('GAME_INFO: resolving calamity selection'))
+        util.game_info('GAME_INFO: resolving calamity selection')
         for player in self.players:
             calamities = player.reveal_calamities()
             self.discard_calamities(player, calamities)
 
     def phase_9_calamity_resolution(self) -> None:
-        print(util.format_game_info('GAME_INFO: resolving calamity resolution'))
+        util.game_info('GAME_INFO: resolving calamity resolution')
         for calamity in sorted(self.calamities, key=lambda x: x.order_calamity(), reverse=True):
             player = self.calamities.pop(calamity)
             text = f'{self.trailing_str}{player.name} resolve {calamity.name}.'
@@ -304,7 +517,7 @@ class Game():
             self.discard_pile.append(calamity)
 
     def phase_10_special_abilities(self) -> None:
-        print(util.format_game_info('GAME_INFO: special abilities'))
+        util.game_info('GAME_INFO: special abilities')
         if not self.resolve_provincial_empire:
             self.resolve_provincial_empire = Requests.get_confirmation(
                 'Does Provincial Empire need to be resolved?[y]')
@@ -312,7 +525,7 @@ class Game():
             attacker, defender = Requests.get_players(
                 'Please name attacker and defender for provincial empire.\n', self.players)
             while attacker is not None and defender is not None:
-                attacker.draw_card(defender, self.trailing_str)
+                attacker.draw_card(defender, self.rng)
                 attacker, defender = Requests.get_players(
                     'Please name attacker and defender for provincial empire.\n', self.players)
 
@@ -324,77 +537,88 @@ class Game():
                 'Please name a player to use Trade Routes.', self.players)
             while player is not None:
                 cards = []
-                player.discard_cards(cards, self.trailing_str*2)
+                Requests.PROVIDER.discard_cards(self, player, cards, self.trailing_str*2)
                 face_value = sum([card.value for card in cards])
-                print(util.format_info(
-                    f'You discarded cards with a face value of {face_value}. Please take {2*face_value} treasure tokens.'))
+                util.info(
+                    f'You discarded cards with a face value of {face_value}. Please take {2*face_value} treasure tokens.')
                 player = Requests.get_player(
                     'Please name a player to use Trade Routes.', self.players)
         Requests.wait_for_action('Resolve other special abilities')
 
     def phase_11_remove_surplus_populations(self) -> None:
-        print(util.format_game_info('GAME_INFO: remove surplus populations'))
+        util.game_info('GAME_INFO: remove surplus populations')
         Requests.wait_for_action('Remove surplus populations')
 
     def phase_12_civilization_advances_acquisition(self) -> None:
-        print(util.format_game_info(
-            'GAME_INFO: resolving civilization_advances_acquisition'))
+        util.game_info('GAME_INFO: resolving civilization_advances_acquisition')
         for player in self.players:
             if len(player.handcards) == 0:
                 continue
             print_step()
-            print(util.format_info(
-                f'\n{self.trailing_str}{player.name} has {len(player.handcards)} cards:'))
+            util.info(f'\n{self.trailing_str}{player.name} has {len(player.handcards)} cards:')
 
+            before = evaluate(player.handcards)
             cards = []
 
-            player.discard_cards(cards, self.trailing_str*2)
+            Requests.PROVIDER.discard_cards(self, player, cards, self.trailing_str*2)
 
-            while len(player.handcards) > self.hand_limit or Requests.get_confirmation(
+            while len(player.handcards) > self.hand_limit or Requests.PROVIDER.discard_more(
+                    self, player,
                     f'Do you want to discard more cards? [{"y"}]:'
                     f'{self.trailing_str}You already handed in {len(cards)} with a value of {evaluate(cards)}\n'
                     f'{self.trailing_str*2}{cards}\n'
             ):
                 if len(player.handcards) > self.hand_limit:
-                    print(util.format_info(
+                    util.info(
                         f'{self.trailing_str}Please discard at least {len(player.handcards) - self.hand_limit} more cards.\n'
                         f'{self.trailing_str}You already handed in {len(cards)} with a value of {evaluate(cards)}\n'
                         f'{self.trailing_str*2}{cards}\n'
-                    ))
-                player.discard_cards(cards)
+                    )
+                missing = len(player.handcards) - self.hand_limit
+                Requests.PROVIDER.discard_cards(
+                    self, player, cards, count=missing if missing > 0 else None)
 
-            self.discard_pile += cards
+            self.discard(player, cards, 'civilization advances', before)
 
     def phase_13_ast_alteration(self) -> None:
-        print(util.format_game_info('GAME_INFO: ast_alteration'))
+        util.game_info('GAME_INFO: ast_alteration')
         Requests.wait_for_action('Move succession markers')
         Requests.wait_for_action('Check for game end')
-        print(util.format_info('Reshuffling trade cards'))
-        stacks = {}
-        while self.discard_pile:
-            card = self.discard_pile.pop()
-            if card == self.water:
-                continue
-            card.last_owner = None
-            if abs(card.value) in stacks:
-                stacks[abs(card.value)].append(card)
-            else:
-                stacks[abs(card.value)] = [card]
+        util.info('Reshuffling trade cards')
+        self.reshuffle_discard_pile()
 
-        for stack in stacks.values():
-            random.shuffle(stack)
-
-        self.add_cards_to_stacks(stacks)
+    def reshuffle_discard_pile(self) -> None:
+        # the discard pile is taken from the top
+        self.stacks.reshuffle(reversed(self.discard_pile), self.rng)
+        self.discard_pile.clear()
 
     def next_round(self) -> None:
         self.round = self.round + 1
 
     def save_game(self) -> None:
-        json_str = json.dumps(jsonpickle.encode(self, keys=True))
-        file = Path(f'temp/autosave_round_{self.round}.json')
-        file.parent.mkdir(parents=True, exist_ok=True)
-        file.touch(exist_ok=True)
-        file.write_text(json_str, encoding='utf-8')
+        # snapshot on the game thread, the disk write happens in the background
+        components.autosave.writer().submit(self.round, components.savegame.encode(self))
+
+    def __setstate__(self, state: Dict) -> None:
+        # saves of older versions lack attributes that were added since
+        self.init_state()
+        self.__dict__.update(state)
+        if 'cards' not in state:
+            self.register_cards()
+        if not isinstance(self.stacks, TradeStacks):
+            self.stacks = TradeStacks.from_dict(self.water, self.stacks)
+
+    def register_cards(self) -> None:
+        # give the cards of an older save ids, the water card first
+        self.cards = CardRegistry(self.water)
+        cards = [card for stack in self.stacks.values() for card in stack] + self.discard_pile + list(self.calamities)
+        for player in self.players:
+            cards.extend(player.handcards)
+            cards.extend(player.priority)
+            cards.extend(player.offer)
+        for card in dict.fromkeys(cards):
+            if card is not self.water:
+                self.cards.add(card)
 
     def __repr__(self) -> str:
         return self.__str__()
@@ -1,148 +1,168 @@
 from __future__ import annotations
-from typing import List, Dict, Tuple
+from typing import Callable, FrozenSet, Iterable, Iterator, List, Dict, Tuple
 import random
 from components.card import Card
-import util.texts as util
+from util.cache import LRUCache
+
+# valuations shared by all hands with the same content
+VALUATIONS = LRUCache(maxsize=4096)
+
+# keyed by card objects rather than ids, every game has its own cards but shares the cache
+HandSignature = FrozenSet[Tuple[Card, int]]
 
 
 class Handcards():
-    def __init__(self, cards: List[Card] = None) -> None:
-        super().__init__()
-        self.cards: List[Card] = cards.copy() if cards else []
+    def __init__(self, cards: Iterable[Card] = None) -> None:
+        self.counts: Dict[Card, int] = {}
+        self.size = 0
+        # running sum of all positive set values, i.e. evaluate()
+        self.value = 0
+        # number of cards and positive set value that belong to completed sets
+        self.full_set_cards = 0
+        self.full_set_value = 0
+        self.signature_cache: HandSignature = None
+        self.values_cache: Dict[Card, Tuple[int, float, int]] = None
+        if cards:
+            self.extend(cards)
+
+    @classmethod
+    def from_counts(cls, counts: Dict[Card, int]) -> Handcards:
+        handcards = cls()
+        for card, count in counts.items():
+            handcards.set_count(card, count)
+        return handcards
+
+    def set_count(self, card: Card, count: int) -> None:
+        old = self.counts.get(card, 0)
+        self.signature_cache = None
+        self.values_cache = None
+        if count:
+            self.counts[card] = count
+        elif old:
+            del self.counts[card]
+
+        self.size += count - old
+        positive = card.value > 0
+        if positive:
+            self.value += card.set_value(count) - card.set_value(old)
+        if old == card.max_count:
+            self.full_set_cards -= old
+            if positive:
+                self.full_set_value -= card.set_value(old)
+        if count == card.max_count:
+            self.full_set_cards += count
+            if positive:
+                self.full_set_value += card.set_value(count)
 
     def append(self, card: Card) -> None:
-        self.cards.append(card)
+        self.set_count(card, self.counts.get(card, 0) + 1)
 
-    def extend(self, cards: List[Card]) -> None:
-        self.cards.extend(cards)
+    def extend(self, cards: Iterable[Card]) -> None:
+        for card in cards:
+            self.append(card)
 
     def remove(self, card: Card) -> None:
-        self.cards.remove(card)
+        count = self.counts.get(card, 0)
+        if count == 0:
+            raise ValueError(f'{card} not in handcards')
+        self.set_count(card, count - 1)
+
+    def remove_set(self, card: Card) -> List[Card]:
+        count = self.counts.get(card, 0)
+        self.set_count(card, 0)
+        return [card] * count
+
+    def clear(self) -> None:
+        self.counts = {}
+        self.size = 0
+        self.value = 0
+        self.full_set_cards = 0
+        self.full_set_value = 0
+        self.signature_cache = None
+        self.values_cache = None
+
+    def copy(self) -> Handcards:
+        return Handcards.from_counts(self.counts)
+
+    def filter(self, function: Callable[[Card], bool]) -> Handcards:
+        return Handcards.from_counts({card: count for card, count in self.counts.items() if function(card)})
+
+    def without_full_sets(self) -> Handcards:
+        return Handcards.from_counts({card: count for card, count in self.counts.items() if count != card.max_count})
 
-    def filter(self, function) -> Handcards:
-        return Handcards(list(filter(function, self.cards)))
+    def count_without_full_sets(self) -> int:
+        return self.size - self.full_set_cards
 
-    def get_card(self, index: int = 0) -> Card:
-        return self.cards[index]
+    def types(self) -> List[Card]:
+        return list(self.counts)
 
-    def get_cards(self) -> List[Card]:
-        return self.cards.copy()
+    def count(self, card: Card) -> int:
+        return self.counts.get(card, 0)
 
-    def get_random_card(self) -> Card:
-        return random.choice(self.cards)
+    def get_random_card(self, rng: random.Random = random) -> Card:
+        return rng.choices(list(self.counts), weights=list(self.counts.values()))[0]
 
     def evaluate(self) -> int:
-        value = 0
-        for card in filter(lambda x: x.value > 0, set(self.cards)):
-            value = value + self.set_value(card)
+        return self.value
 
-        return value
+    def evaluate_without_full_sets(self) -> int:
+        return self.value - self.full_set_value
 
-    def count(self) -> int:
-        return len(self.cards)
+    def signature(self) -> HandSignature:
+        if self.signature_cache is None:
+            self.signature_cache = frozenset(self.counts.items())
+        return self.signature_cache
 
     def set_value(self, card: Card) -> int:
-        count = self.cards.count(card)
-        return count * count * card.value
+        return card.set_value(self.counts.get(card, 0))
 
     def card_value(self, card: Card) -> float:
-        count = self.cards.count(card)
+        count = self.counts.get(card, 0)
         if count == 0:
             return 0
-        value = self.set_value(card)
-        return value / count
+        return card.card_value(count)
 
     def values(self) -> Dict[Card, Tuple[int, float, int]]:
-        values = {}
-        for card in set(self.cards):
-            card_count = self.cards.count(card)
-            set_value = self.set_value(card)
-            card_value = self.card_value(card)
-
-            values[card] = (set_value, card_value, card_count)
-        return values
-
-    def get_internal_value(self, card: Card) -> int:
-        current_value = self.card_value(card)
-        new_set = Handcards(self.get_cards() + [card])
-        new_value = new_set.card_value(card)
-        return new_value - current_value
-
-    def get_lowest_value_card(self, excluded_cards: Handcards, calamity: bool = True) -> Card:
-        # order handcards by internal value in desc order
-        cards = filter(lambda x: x not in excluded_cards.get_cards(),
-                       self.sorted_card(reverse=False))
-        card = next(
-            filter(
-                lambda x: x.tradeable if calamity else x.value >= 0,
-                [item[0] for item in cards]
-            ), None
-        )
-        if card is None:
-            return None
-
-        self.remove(card)
-        return card
-
-    def get_card_by_value(self, value: int, excluded_cards: Handcards) -> Card:
-        cards = filter(lambda x: x not in excluded_cards.get_cards(),
-                       self.sorted_card(reverse=True))
-
-        return_card = None
-        for card in filter(lambda x: x.value >= 0, [item[0] for item in cards]):
-            return_card = card
-            if card.value >= value:
-                break
-        if return_card is None:
-            return None
-
-        self.remove(return_card)
-        return return_card
-
-    def discard_cards(self, discarded_cards: List[Card], preceding_str: str = '') -> None:
-        print(util.format_info(self.__str__(preceding_str=preceding_str)))
-
-        discards = input(util.format_action(
-            'Please name cards you want to discard in comma-separated fashion. trailing - for whole set:\n')).split(',')
-        for discard in discards:
-            if discard == '':
-                continue
-            if discard[0] == '-':
-                # get the whole set within the handcards
-                extracted_cards = [
-                    card for card in self.cards if card.name == discard[1:]]
-                discarded_cards.extend(extracted_cards)
-                self.cards = [
-                    card for card in self.cards if card not in extracted_cards]
-            else:
-                for card in self.cards:
-                    if card.name == discard:
-                        self.remove(card)
-                        discarded_cards.append(card)
-                        break
-
-    def reveal_calamities(self) -> List[Card]:
-        calamities = list(filter(lambda x: x.is_calamity(), self.cards))
-        for card in calamities:
-            self.cards.remove(card)
-        return calamities
-
-    def sorted_card(self, reverse: bool = False) -> List[Card]:
-        return sorted(self.values().items(), key=lambda x: (x[1][1], x[0].value), reverse=reverse)
-
-    def sorted_set(self, reverse: bool = False) -> List[Card]:
-        return sorted(list(set(self.cards)), key=lambda x: (x.value, self.set_value(x), x.name), reverse=reverse)
-
-    def order_by_internal_value(self, card: Card) -> Tuple[int, int, int, str]:
-        return (self.get_internal_value(card), self.set_value(card), card.value, card.name)
-
-    def __str__(self, calamities: bool = False, preceding_str: str = '') -> str:
-        text = ''
-        sorted_handcards = self.sorted_set(reverse=True)
-        if not calamities:
-            sorted_handcards = filter(lambda x: x.value >= 0, sorted_handcards)
-        for card in sorted_handcards:
-            count = self.cards.count(card)
-            text += f'{preceding_str}{"*" if count == card.max_count else " "}{card.name:<10}({card.value}): {count}/{card.max_count} cards with a set value of {self.set_value(card):>3}\n'
-
-        return text
+        if self.values_cache is None:
+            signature = self.signature()
+            self.values_cache = VALUATIONS.get(
+                ('values', signature), lambda: calc_signature_values(signature))
+        return self.values_cache
+
+    def values_without_full_sets(self) -> Dict[Card, Tuple[int, float, int]]:
+        # the values of a card only depend on its own count, so dropping full sets keeps the others
+        signature = self.signature()
+        return VALUATIONS.get(('without_full_sets', signature), lambda: {
+            card: item for card, item in self.values().items() if item[2] != card.max_count
+        })
+
+    def __add__(self, cards: Iterable[Card]) -> Handcards:
+        handcards = self.copy()
+        handcards.extend(cards)
+        return handcards
+
+    def __iadd__(self, cards: Iterable[Card]) -> Handcards:
+        self.extend(cards)
+        return self
+
+    def __contains__(self, card: Card) -> bool:
+        return card in self.counts
+
+    def __iter__(self) -> Iterator[Card]:
+        for card, count in list(self.counts.items()):
+            for _ in range(count):
+                yield card
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f'{list(self)}'
+
+
+def calc_signature_values(signature: HandSignature) -> Dict[Card, Tuple[int, float, int]]:
+    # canonical order, so that ties are broken the same way for every hand with this content
+    return {
+        card: (card.set_value(count), card.card_value(count), count)
+        for card, count in sorted(signature, key=lambda x: (x[0].value, x[0].name))
+    }
@@ -0,0 +1,178 @@
+from __future__ import annotations
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
+import json
+import os
+import time
+import zlib
+
+import components.game
+import components.savegame
+
+DATA = 'history.dat'
+INDEX = 'index.jsonl'
+DELTA_MAGIC = b'MEDELT'
+FULL = 'full'
+DELTA = 'delta'
+
+Tables = Tuple[Dict, List[array]]
+
+
+class HistoryEntry():
+    # one save in the history, the payload is at offset in the data file
+    def __init__(self, number: int, game_round: int, kind: str, offset: int, size: int, parent: int,
+                 checksum: int, timestamp: float, seed: int) -> None:
+        self.number = number
+        self.round = game_round
+        self.kind = kind
+        self.offset = offset
+        self.size = size
+        # the entry a delta applies to, the previous save of the same game
+        self.parent = parent
+        self.checksum = checksum
+        self.timestamp = timestamp
+        self.seed = seed
+
+    def to_list(self) -> List:
+        return [self.number, self.round, self.kind, self.offset, self.size, self.parent,
+                self.checksum, self.timestamp, self.seed]
+
+    @classmethod
+    def from_list(cls, item: List) -> HistoryEntry:
+        return cls(*item)
+
+
+def encode_delta(old: Tables, new: Tables) -> bytes:
+    # changed header keys and the card id arrays that differ, e.g. stacks, hands and discard pile
+    (old_header, old_arrays), (header, arrays) = old, new
+    changed = [index for index, ids in enumerate(arrays) if index >= len(old_arrays) or ids != old_arrays[index]]
+    delta = {
+        'header': {key: value for key, value in header.items() if old_header.get(key) != value},
+        'removed': [key for key in old_header if key not in header],
+        'arrays': len(arrays),
+        'changed': changed,
+    }
+    body = json.dumps(delta, separators=(',', ':')).encode('utf-8')
+    # encode_ids swaps the bytes of its argument on big endian machines, the tables are kept as the next base
+    return b''.join([components.savegame.HEADER.pack(DELTA_MAGIC, components.savegame.VERSION, len(body)), body] +
+                    [components.savegame.encode_ids(array('H', arrays[index])) for index in changed])
+
+
+def apply_delta(base: Tables, data: bytes) -> Tables:
+    data = memoryview(data)
+    magic, version, length = components.savegame.HEADER.unpack_from(data)
+    if magic != DELTA_MAGIC:
+        raise ValueError('not a save history delta')
+    if version > components.savegame.VERSION:
+        raise ValueError(
+            f'save history format {version} is newer than the supported format {components.savegame.VERSION}')
+    offset = components.savegame.HEADER.size
+    delta = json.loads(bytes(data[offset:offset + length]).decode('utf-8'))
+    offset += length
+
+    old_header, old_arrays = base
+    header = {key: value for key, value in old_header.items() if key not in delta['removed']}
+    header.update(delta['header'])
+    arrays = list(old_arrays[:delta['arrays']])
+    arrays += [None] * (delta['arrays'] - len(arrays))
+    for index in delta['changed']:
+        arrays[index], offset = components.savegame.decode_ids(data, offset)
+    return header, arrays
+
+
+class SaveHistory():
+    # append-only saves of every round with an index, full snapshots every interval saves and deltas in between.
+    # loading an older round never rewrites anything, the game continues from there with new entries
+    def __init__(self, directory: Path, interval: int = 10) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.entries: List[HistoryEntry] = []
+        # entry and tables of the last save written by this process, the base of the next delta
+        self.last: Tuple[HistoryEntry, Tables] = None
+        self.deltas = 0
+        index = directory / INDEX
+        if index.exists():
+            self.read_index(index)
+
+    def read_index(self, index: Path) -> None:
+        data = index.read_bytes()
+        complete = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('unterminated line')
+                self.entries.append(HistoryEntry.from_list(json.loads(line)))
+            except ValueError:
+                break
+            complete += len(line)
+        if complete < len(data):
+            # an interrupted append leaves a partial last line, the next append would be glued onto it
+            with open(index, 'r+b') as file:
+                file.truncate(complete)
+
+    def append(self, game_round: int, data: bytes) -> HistoryEntry:
+        tables = components.savegame.decode_tables(data)
+        if self.last is None or self.deltas + 1 >= self.interval:
+            kind, payload, parent = FULL, data, None
+            self.deltas = 0
+        else:
+            kind, payload, parent = DELTA, encode_delta(self.last[1], tables), self.last[0].number
+            self.deltas += 1
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # the payload is on disk before the index points to it
+        with open(self.directory / DATA, 'ab') as file:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        entry = HistoryEntry(len(self.entries), game_round, kind, offset, len(payload), parent,
+                             zlib.crc32(payload), time.time(), tables[0].get('seed'))
+        with open(self.directory / INDEX, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry.to_list()) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.entries.append(entry)
+        self.last = (entry, tables)
+        return entry
+
+    def latest_seed(self) -> int:
+        return self.entries[-1].seed if self.entries else None
+
+    def rounds(self) -> List[int]:
+        return sorted({entry.round for entry in self.entries if entry.seed == self.latest_seed()})
+
+    def find(self, game_round: int = None) -> HistoryEntry:
+        # several games can share a directory, rounds are looked up in the game saved last.
+        # the latest save of a round wins, earlier ones belong to a history that was rolled back
+        seed = self.latest_seed()
+        for entry in reversed(self.entries):
+            if entry.seed == seed and (game_round is None or entry.round == game_round):
+                return entry
+        raise ValueError(f'no save of round {game_round}, the history has rounds {self.rounds()}')
+
+    def read(self, entry: HistoryEntry) -> bytes:
+        with open(self.directory / DATA, 'rb') as file:
+            file.seek(entry.offset)
+            payload = file.read(entry.size)
+        if len(payload) != entry.size or zlib.crc32(payload) != entry.checksum:
+            raise ValueError(f'save {entry.number} of round {entry.round} is damaged')
+        return payload
+
+    def tables(self, entry: HistoryEntry) -> Tables:
+        # back to the last full snapshot, then forward through at most interval deltas
+        chain = [entry]
+        while chain[-1].kind != FULL:
+            chain.append(self.entries[chain[-1].parent])
+        tables = components.savegame.decode_tables(self.read(chain.pop()))
+        for delta in reversed(chain):
+            tables = apply_delta(tables, self.read(delta))
+        return tables
+
+    def load(self, game_round: int = None) -> components.game.Game:
+        return components.savegame.from_tables(*self.tables(self.find(game_round)))
+
+
+def is_history(path: Path) -> bool:
+    return (path / INDEX).exists()
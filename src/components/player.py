@@ -1,8 +1,13 @@
 from __future__ import annotations
+from typing import Iterable, List, Tuple, Dict, Set
 import random
-from typing import List, Tuple, Dict, Set
 from components.card import Card
+from components.handcards import Handcards
 import util.texts as util
+import util.interaction as Requests
+
+# trader, partner, cards gained and given by the trader. The trader is whoever ended up leading the trade
+Trade = Tuple['Player', 'Player', List[Card], List[Card]]
 
 
 class Player():
@@ -10,12 +15,17 @@ class Player():
         self.name = name
         self.ast_ranking = ast_ranking
         self.ast_position = 0
-        self.handcards = handcards
+        self.handcards = Handcards(handcards)
         self.cities: int = 0
         self.priority_threshold = None
         self.trades: Dict[int, int] = {}
         self.priority: Set[Card] = set()
         self.offer: List[Card] = []
+        # bumped whenever handcards, priority or offer change
+        self.version = 0
+
+    def touch(self) -> None:
+        self.version += 1
 
     def diff_handcard_value(self, incoming: List[Card]) -> Tuple[int, int]:
         new_handcards = self.handcards + incoming
@@ -28,12 +38,10 @@ class Player():
     def calc_offer(self) -> None:
         # remove full sets from handcards first, so that the player will definitely hold that set.
         # determine full sets first:
-        cards = without_full_sets(self.handcards)
-
-        values = calc_values(cards)
+        values = self.handcards.values_without_full_sets()
         sorted_handcards = sorted(
             values.items(), key=lambda x: x[1][1], reverse=True)
-        value_cards = evaluate(cards)
+        value_cards = self.handcards.evaluate_without_full_sets()
 
         self.priority = set()
         self.offer = []
@@ -46,12 +54,14 @@ class Player():
             if rolling_sum >= value_cards * self.priority_threshold:
                 break
 
-        self.offer = list(filter(lambda x: x.offerable, cards))
+        self.offer = [card for card, item in values.items()
+                      if card.offerable for _ in range(item[2])]
 
         self.offer.sort(key=lambda x: x.value, reverse=True)
+        self.touch()
 
     def evaluate_offer(self, other: Player) -> Tuple[Player, List[Card], List[Card], int]:
-        if len(without_full_sets(self.handcards)) < 3 or len(without_full_sets(other.handcards)) < 3:
+        if self.handcards.count_without_full_sets() < 3 or other.handcards.count_without_full_sets() < 3:
             return None
 
         gain_options = sorted([
@@ -63,7 +73,7 @@ class Player():
             if card in other.priority and card not in gain_options
         ], key=other.order_cards_internal_value, reverse=True)
 
-        gain_value = sum([calc_card_value(card, self.handcards)
+        gain_value = sum([self.handcards.card_value(card)
                          for card in gain_options])
 
         if gain_options and give_options:
@@ -72,7 +82,7 @@ class Player():
             return (other, gain_options, None, gain_value*0.5)
         return None
 
-    def trade(self, trade_option: Tuple[Player, List[Card], List[Card], int]) -> bool:
+    def trade(self, trade_option: Tuple[Player, List[Card], List[Card], int]) -> Trade:
         (other, gain_options, give_options, _) = trade_option
         # gain and give needs to be filled to 2 cards. gain_value and give_value should be identical at that point
         # then 3 card is added by taking card with lowest value
@@ -87,6 +97,8 @@ class Player():
                 ), key=other.order_cards_internal_value,
                 reverse=True
             )
+        if not give_options:
+            return None
 
         # Man hat sich gefunden, indem die Prios übereinstimmen. Jetzt wird der konkrete Handel besprochen.
         # Dafür werden abwechselnd Karten benannt, die abgegeben werden und dem anderen Spieler bestmöglich helfen.
@@ -122,7 +134,7 @@ class Player():
             if None in gain or None in give:
                 self.cleanup_trade(give)
                 other.cleanup_trade(gain)
-                return False
+                return None
             diff = evaluate(gain) - evaluate(give)
             # Anschließend versucht give zu matchen
             give.append(self.get_card_by_value(diff, gain))
@@ -130,31 +142,38 @@ class Player():
         if None in gain or None in give:
             self.cleanup_trade(give)
             other.cleanup_trade(gain)
-            return False
+            return None
 
         return self.fulfill_trade(other, gain, give)
 
-    def fulfill_trade(self, other: Player, gain: List[Card], give: List[Card]) -> bool:
+    def fulfill_trade(self, other: Player, gain: List[Card], give: List[Card]) -> Trade:
         give.append(self.get_lowest_value_card([]))
         gain.append(other.get_lowest_value_card([]))
         if None in gain or None in give:
             self.cleanup_trade(give)
             other.cleanup_trade(gain)
-            return False
+            return None
+        return self.exchange(other, gain, give)
+
+    def exchange(self, other: Player, gain: List[Card], give: List[Card]) -> Trade:
+        # both sides already took their cards out of their hands
         # diff_self = self.diff_handcard_value(gain)
         # diff_other = other.diff_handcard_value(give)
         self.handcards.extend(gain)
         other.handcards.extend(give)
+        self.touch()
+        other.touch()
 
         self.track_last_owner(give)
         other.track_last_owner(gain)
         # print(self, other, gain, give, evaluate(gain), evaluate(give), diff_self, diff_other)
         self.calc_offer()
         other.calc_offer()
-        return True
+        return (self, other, gain, give)
 
     def cleanup_trade(self, cards: List[Card]) -> None:
         self.handcards += filter(lambda x: x is not None, cards)
+        self.touch()
 
     def track_last_owner(self, cards: List[Card]) -> None:
         for card in filter(lambda x: x.is_calamity(), cards):
@@ -162,9 +181,8 @@ class Player():
 
     def get_lowest_value_card(self, offered_cards: List[Card], calamity: bool = True) -> Card:
         # order handcards by internal value in desc order
-        cards = without_full_sets(self.handcards)
-        values = calc_values(
-            list(filter(lambda x: x not in offered_cards and x not in self.priority, cards)))
+        values = {card: item for card, item in self.handcards.values_without_full_sets().items()
+                  if card not in offered_cards and card not in self.priority}
         card = next(
             filter(
                 lambda x: x.tradeable if calamity else x.value >= 0,
@@ -179,9 +197,8 @@ class Player():
         return card
 
     def get_card_by_value(self, value: int, offered_cards: List[Card]) -> Card:
-        cards = without_full_sets(self.handcards)
-        values = calc_values(
-            list(filter(lambda x: x not in offered_cards and x not in self.priority, cards)))
+        values = {card: item for card, item in self.handcards.values_without_full_sets().items()
+                  if card not in offered_cards and card not in self.priority}
         return_card = None
         for card in filter(lambda x: x.value >= 0, [item[0] for item in sorted(
                 values.items(), key=lambda x: x[1][1], reverse=False)]):
@@ -201,15 +218,16 @@ class Player():
         calamities = list(filter(lambda x: x.is_calamity(), self.handcards))
         for card in calamities:
             self.handcards.remove(card)
+        self.touch()
         return calamities
 
     def discard_cards(self, cards: List[Card], preceding_str: str = '') -> None:
         self.print_handcards(preceding_str)
-        discards = input(util.format_action(
+        discards = Requests.get_input(
             'Please name cards you want to discard in comma-separated fashion.\n'
             'preceding * to discard whole set:\n'
             'preceding - to add cards back to handcards\n'
-        )).split(',')
+        ).split(',')
         for discard in discards:
             if discard == '':
                 continue
@@ -222,24 +240,24 @@ class Player():
                     cards.remove(extracted_cards.pop(0))
             elif discard[0] == '*':
                 # get the whole set within the handcards
-                extracted_cards = [
-                    card for card in self.handcards if card.name == discard[1:]]
-                cards.extend(extracted_cards)
-                self.handcards = [
-                    card for card in self.handcards if card not in extracted_cards]
+                for card in self.handcards.types():
+                    if card.name == discard[1:]:
+                        cards.extend(self.handcards.remove_set(card))
             else:
-                for card in self.handcards:
+                for card in self.handcards.types():
                     if card.name == discard:
                         self.handcards.remove(card)
                         cards.append(card)
                         break
+        self.touch()
 
-    def draw_card(self, other: Player) -> None:
-        card = random.choice(other.handcards)
+    def draw_card(self, other: Player, rng: random.Random = random) -> None:
+        card = other.handcards.get_random_card(rng)
         other.handcards.remove(card)
         self.handcards.append(card)
-        print(util.format_info(
-            f'{self.name} drew {card.name} from {other.name}'))
+        self.touch()
+        other.touch()
+        util.info(f'{self.name} drew {card.name} from {other.name}')
 
     def order_cities(self) -> Tuple[int, int]:
         return (self.cities, self.ast_ranking)
@@ -248,7 +266,7 @@ class Player():
         return (self.ast_position, self.ast_ranking)
 
     def order_cards_internal_value(self, card: Card) -> Tuple[int, int, int, str]:
-        return (calc_card_value(card, self.handcards), calc_set_value(card, self.handcards), card.value, card.name)
+        return (self.handcards.card_value(card), self.handcards.set_value(card), card.value, card.name)
 
     def __repr__(self) -> str:
         return self.__str__()
@@ -257,57 +275,42 @@ class Player():
         return f'{self.name}'
 
     def print_handcards(self, preceding_str: str = '', calamities: bool = False) -> None:
-        text = ''
-        sorted_handcards = sorted(
-            list(set(self.handcards)), key=lambda x: (x.value, calc_set_value(x, self.handcards), x.name), reverse=True)
-        if not calamities:
-            sorted_handcards = filter(lambda x: x.value >= 0, sorted_handcards)
-        for card in sorted_handcards:
-            count = self.handcards.count(card)
-            text += f'{preceding_str}{"*" if count == card.max_count else " "}{card.name:<10}({card.value}): {count}/{card.max_count} cards with a set value of {calc_set_value(card, self.handcards):>3}\n'
-        print(util.format_info(text))
-
-
-def evaluate(cards: List[Card]) -> int:
-    value = 0
-    for card in filter(lambda x: x.value > 0, set(cards)):
-        value = value + calc_set_value(card, cards)
-
-    return value
-
-
-def calc_card_value(card: Card, cards: List[Card]) -> float:
-    count = cards.count(card)
-    if count == 0:
-        return 0
-    if count == card.max_count:
-        value = calc_set_value(card, cards)
-        return int(value / count)
-    # add additional card to set
-    add_cards = cards.copy() + [card]
-    value = calc_set_value(card, cards)
-    add_value = calc_set_value(card, add_cards)
-    return add_value - value
-
-
-def calc_set_value(card: Card, cards: List[Card]) -> int:
-    count = cards.count(card)
-    return count * count * card.value
-
-
-def calc_values(cards: List[Card]) -> Dict[Card, Tuple[int, float, int]]:
-    values = {}
-    for card in set(cards):
-        card_count = cards.count(card)
-        set_value = calc_set_value(card, cards)
-        card_value = calc_card_value(card, cards)
-
-        values[card] = (set_value, card_value, card_count)
-    return values
-
-
-def without_full_sets(cards: List[Card]) -> List[Card]:
-    full_sets = [card for card in set(
-        cards) if cards.count(card) == card.max_count]
-    filtered_cards = list(filter(lambda x: x not in full_sets, cards))
-    return filtered_cards
+        if not util.enabled(util.INFO):
+            return
+        # set values and counts come from the cached valuation of the hand
+        values = sorted(self.handcards.values().items(), key=lambda x: (x[0].value, x[1][0], x[0].name), reverse=True)
+        util.info(''.join(
+            f'{preceding_str}{"*" if count == card.max_count else " "}{card.name:<10}({card.value}): '
+            f'{count}/{card.max_count} cards with a set value of {set_value:>3}\n'
+            for card, (set_value, _, count) in values if calamities or card.value >= 0))
+
+    def __setstate__(self, state: Dict) -> None:
+        # saves written before hands were kept as Handcards store plain lists
+        if not isinstance(state['handcards'], Handcards):
+            state['handcards'] = Handcards(state['handcards'])
+        self.version = 0
+        self.__dict__.update(state)
+
+
+def as_handcards(cards: Iterable[Card]) -> Handcards:
+    return cards if isinstance(cards, Handcards) else Handcards(cards)
+
+
+def evaluate(cards: Iterable[Card]) -> int:
+    return as_handcards(cards).evaluate()
+
+
+def calc_card_value(card: Card, cards: Iterable[Card]) -> float:
+    return as_handcards(cards).card_value(card)
+
+
+def calc_set_value(card: Card, cards: Iterable[Card]) -> int:
+    return as_handcards(cards).set_value(card)
+
+
+def calc_values(cards: Iterable[Card]) -> Dict[Card, Tuple[int, float, int]]:
+    return as_handcards(cards).values()
+
+
+def without_full_sets(cards: Iterable[Card]) -> Handcards:
+    return as_handcards(cards).without_full_sets()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+from typing import Dict, List, Set
+import random
+
+from components.card import Card
+from components.game import Game
+from components.player import Player, evaluate
+from util.interaction import InputProvider
+
+
+class PolicyProvider(InputProvider):
+    # plays every decision automatically and declines all other questions
+    name = 'policy'
+    waits = False
+
+    def __init__(self, rng: random.Random, advance_cost: int = 100) -> None:
+        self.rng = rng
+        self.advance_cost = advance_cost
+        self.purchased: Set[Player] = set()
+        self.spent: Dict[Player, int] = {}
+
+    def get_input(self, request: str) -> str:  # pylint: disable=W0613
+        return ''
+
+    def cities(self, game: Game, player: Player) -> int:
+        # cities grow with the rounds played and spread a little between players
+        self.purchased.discard(player)
+        return min(9, max(0, game.round - 2 + self.rng.randint(-1, 2)))
+
+    def purchase(self, game: Game, player: Player, options: List[int]) -> int:
+        # at most one additional card per round
+        if player in self.purchased:
+            return None
+        self.purchased.add(player)
+        if player.cities < 3 or not options or self.rng.random() > 0.25:
+            return None
+        return max(options)
+
+    def prevented_banditry(self, game: Game, player: Player) -> int:  # pylint: disable=W0613
+        return 0
+
+    def corruption_face_value(self, game: Game, player: Player) -> int:  # pylint: disable=W0613
+        return 10
+
+    def discard_cards(self, game: Game, player: Player, cards: List[Card], preceding_str: str = '',
+                      count: int = None, face_value: int = None) -> None:  # pylint: disable=W0613
+        if count is None and face_value is None:
+            spent = self.spend(player)
+            self.spent[player] = self.spent.get(player, 0) + evaluate(spent)
+            cards += spent
+        else:
+            cards += self.lowest_cards(player, count, face_value)
+
+    def discard_more(self, game: Game, player: Player, request: str) -> bool:  # pylint: disable=W0613
+        return False
+
+    def lowest_cards(self, player: Player, count: int = None, face_value: int = None) -> List[Card]:
+        cards = sorted(
+            player.handcards, key=lambda x: (player.handcards.card_value(x), x.value))
+        discards = []
+        discard_value = 0
+        for card in cards:
+            if count is not None and len(discards) >= count:
+                break
+            if face_value is not None and discard_value >= face_value:
+                break
+            discards.append(card)
+            discard_value += card.value
+        for card in discards:
+            player.handcards.remove(card)
+        player.touch()
+        return discards
+
+    def spend(self, player: Player) -> List[Card]:
+        # civilization advances are bought with the whole hand once it is worth enough
+        if evaluate(player.handcards) < self.advance_cost:
+            return []
+        return self.lowest_cards(player, count=len(player.handcards))
@@ -0,0 +1,202 @@
+from __future__ import annotations
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import gzip
+import json
+import os
+import struct
+import sys
+
+from components.card import Card, CardRegistry
+from components.player import Player
+from components.stacks import TradeStacks
+import components.game
+
+MAGIC = b'MESAVE'
+GZIP_MAGIC = b'\x1f\x8b'
+VERSION = 1
+SUFFIX = '.mesave'
+
+# magic, format version, payload length of the header json
+HEADER = struct.Struct('<6sHI')
+LENGTH = struct.Struct('<I')
+
+
+def encode_cards(cards: Iterable[Card]) -> array:
+    return array('H', [card.id for card in cards])
+
+
+def encode_ids(ids: array) -> bytes:
+    if sys.byteorder != 'little':
+        ids.byteswap()
+    return LENGTH.pack(len(ids)) + ids.tobytes()
+
+
+def decode_ids(data: memoryview, offset: int) -> Tuple[array, int]:
+    (length,) = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    ids = array('H')
+    ids.frombytes(data[offset:offset + 2 * length])
+    if sys.byteorder != 'little':
+        ids.byteswap()
+    return ids, offset + 2 * length
+
+
+def encode(game: components.game.Game) -> bytes:
+    players = {player: index for index, player in enumerate(game.players)}
+
+    arrays = [encode_cards(stack) for stack in game.stacks.values()]
+    for player in game.players:
+        arrays.append(encode_cards(player.handcards))
+        # sets iterate in hash order, which differs between processes
+        arrays.append(encode_cards(sorted(player.priority, key=lambda card: card.id)))
+        arrays.append(encode_cards(player.offer))
+    arrays.append(encode_cards(game.discard_pile))
+    calamities = [[card.id, players[player]] for card, player in game.calamities.items()]
+
+    header = {
+        'cards': [
+            [card.name, card.value, card.max_count, card.additional_set, card.calamity,
+             card.tradeable, card.offerable, players.get(card.last_owner, -1)]
+            for card in game.cards
+        ],
+        'water': game.water.id,
+        'stacks': list(game.stacks),
+        'water_draws': list(game.stacks.water_draws.values()),
+        'players': [
+            {
+                'name': player.name,
+                'ast_ranking': player.ast_ranking,
+                'ast_position': player.ast_position,
+                'cities': player.cities,
+                'priority_threshold': player.priority_threshold,
+                'trades': list(player.trades.items()),
+            } for player in game.players
+        ],
+        'trading_queue': [players[player] for player in game.trading_queue],
+        'calamities': calamities,
+        'round': game.round,
+        'seed': game.seed,
+        'rng': game.rng.getstate(),
+        'hand_limit': game.hand_limit,
+        'trailing_str': game.trailing_str,
+        'resolve_provincial_empire': game.resolve_provincial_empire,
+        'resolve_trade_routes': game.resolve_trade_routes,
+    }
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+
+    return b''.join([HEADER.pack(MAGIC, VERSION, len(header)), header] + [encode_ids(ids) for ids in arrays])
+
+
+def decode_tables(data: bytes) -> Tuple[Dict, List[array]]:
+    # the header and the card id arrays in the order of encode, without building a game:
+    # the stacks, handcards, priority and offer of every player, then the discard pile
+    data = memoryview(data)
+    magic, version, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a compact save file')
+    if version > VERSION:
+        raise ValueError(
+            f'save file format {version} is newer than the supported format {VERSION}')
+    offset = HEADER.size
+    header = json.loads(bytes(data[offset:offset + length]).decode('utf-8'))
+    offset += length
+
+    arrays = []
+    while offset < len(data):
+        ids, offset = decode_ids(data, offset)
+        arrays.append(ids)
+    return header, arrays
+
+
+def decode(data: bytes) -> components.game.Game:
+    return from_tables(*decode_tables(data))
+
+
+def from_tables(header: Dict, arrays: List[array]) -> components.game.Game:
+    tables = iter(arrays)
+
+    def next_cards() -> List[Card]:
+        return [cards[card_id] for card_id in next(tables)]
+
+    game = components.game.Game.__new__(components.game.Game)
+    game.init_state()
+    # the card table is the registry of the game, water comes first and a card id is its index
+    cards = [Card(name, value, max_count, additional_set, calamity, tradeable, offerable)
+             for name, value, max_count, additional_set, calamity, tradeable, offerable, _ in header['cards']]
+    game.water = cards[header['water']]
+    game.cards = CardRegistry(game.water)
+    for card in cards:
+        if card is not game.water:
+            game.cards.add(card)
+    game.stacks = TradeStacks(game.water)
+    for key in header['stacks']:
+        game.stacks.add_cards(next_cards(), key)
+    for key, draws in zip(game.stacks.water_draws, header.get('water_draws', [])):
+        game.stacks.water_draws[key] = draws
+    for item in header['players']:
+        player = Player(item['name'], item['ast_ranking'], next_cards())
+        player.priority = set(next_cards())
+        player.offer = next_cards()
+        player.ast_position = item['ast_position']
+        player.cities = item['cities']
+        player.priority_threshold = item['priority_threshold']
+        player.trades = dict(item['trades'])
+        game.players.append(player)
+    game.discard_pile = next_cards()
+
+    for card, (*_, last_owner) in zip(cards, header['cards']):
+        card.last_owner = game.players[last_owner] if last_owner >= 0 else None
+    game.calamities = {cards[card_id]: game.players[player] for card_id, player in header['calamities']}
+    game.trading_queue = [game.players[index] for index in header['trading_queue']]
+    game.round = header['round']
+    game.seed = header.get('seed')
+    if 'rng' in header:
+        rng_version, rng_state, gauss = header['rng']
+        game.rng.setstate((rng_version, tuple(rng_state), gauss))
+    game.hand_limit = header['hand_limit']
+    game.trailing_str = header['trailing_str']
+    game.resolve_provincial_empire = header['resolve_provincial_empire']
+    game.resolve_trade_routes = header['resolve_trade_routes']
+    return game
+
+
+def decode_legacy(data: bytes) -> components.game.Game:
+    # saves before the compact format: jsonpickle output wrapped in a json string
+    import jsonpickle  # pylint: disable=C0415
+
+    json_str = json.loads(data.decode('utf-8'))
+    return jsonpickle.decode(json_str, classes=(
+        components.game.Game, Player, Card), keys=True)
+
+
+def write(path: Path, data: bytes, compression: int = 0) -> None:
+    # write next to the target and rename, a crash never leaves a truncated save
+    if compression:
+        data = gzip.compress(data, compresslevel=compression, mtime=0)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f'.{path.name}.tmp')
+    with open(temp, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+def save(game: components.game.Game, path: Path, compression: int = 0) -> None:
+    write(path, encode(game), compression)
+
+
+def read(path: Path) -> bytes:
+    data = path.read_bytes()
+    if data.startswith(GZIP_MAGIC):
+        data = gzip.decompress(data)
+    return data
+
+
+def load(path: Path) -> components.game.Game:
+    data = read(path)
+    if data.startswith(MAGIC):
+        return decode(data)
+    return decode_legacy(data)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Tuple
+import random
+
+from components.card import Card
+
+KEYS = range(1, 10)
+
+# cards of every stack, water fallbacks per stack
+StacksSnapshot = Tuple[Dict[int, Tuple[Card, ...]], Dict[int, int]]
+
+
+class TradeStacks():
+    # the nine trade card stacks, with running counts of every card type left in each
+    def __init__(self, water: Card) -> None:
+        self.water = water
+        self.stacks: Dict[int, Deque[Card]] = {key: deque() for key in KEYS}
+        self.counts: Dict[int, Dict[Card, int]] = {key: {} for key in KEYS}
+        self.water_draws: Dict[int, int] = {key: 0 for key in KEYS}
+
+    @classmethod
+    def from_dict(cls, water: Card, stacks: Dict[int, List[Card]]) -> TradeStacks:
+        trade_stacks = cls(water)
+        trade_stacks.add_stacks(stacks)
+        return trade_stacks
+
+    def add_cards(self, cards: Iterable[Card], key: int) -> None:
+        stack = self.stacks[key]
+        counts = self.counts[key]
+        for card in cards:
+            stack.append(card)
+            counts[card] = counts.get(card, 0) + 1
+
+    def add_stacks(self, stacks: Dict[int, List[Card]]) -> None:
+        for key, cards in stacks.items():
+            self.add_cards(cards, key)
+
+    def draw(self, key: int) -> Card:
+        stack = self.stacks[key]
+        if not stack:
+            self.water_draws[key] += 1
+            return self.water
+        card = stack.popleft()
+        counts = self.counts[key]
+        counts[card] -= 1
+        if not counts[card]:
+            del counts[card]
+        return card
+
+    def reshuffle(self, cards: Iterable[Card], rng: random.Random = random) -> None:
+        # sort the cards back into their stacks, shuffled below the cards that are left
+        stacks: Dict[int, List[Card]] = {}
+        for card in cards:
+            if card == self.water:
+                continue
+            card.last_owner = None
+            stacks.setdefault(abs(card.value), []).append(card)
+
+        for stack in stacks.values():
+            rng.shuffle(stack)
+
+        self.add_stacks(stacks)
+
+    def options(self) -> List[int]:
+        return [key for key, stack in self.stacks.items() if stack]
+
+    def composition(self, key: int) -> Dict[Card, int]:
+        return dict(self.counts[key])
+
+    def count(self, key: int, card: Card) -> int:
+        return self.counts[key].get(card, 0)
+
+    def calamities(self, key: int) -> int:
+        return sum(count for card, count in self.counts[key].items() if card.is_calamity())
+
+    def snapshot(self) -> StacksSnapshot:
+        return {key: tuple(stack) for key, stack in self.stacks.items()}, dict(self.water_draws)
+
+    def restore(self, snapshot: StacksSnapshot) -> None:
+        stacks, water_draws = snapshot
+        self.stacks = {key: deque() for key in KEYS}
+        self.counts = {key: {} for key in KEYS}
+        self.add_stacks(stacks)
+        self.water_draws = dict(water_draws)
+
+    def items(self) -> Iterable[Tuple[int, Deque[Card]]]:
+        return self.stacks.items()
+
+    def values(self) -> Iterable[Deque[Card]]:
+        return self.stacks.values()
+
+    def __getitem__(self, key: int) -> Deque[Card]:
+        return self.stacks[key]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.stacks)
+
+    def __len__(self) -> int:
+        return sum(len(stack) for stack in self.stacks.values())
+
+    def __repr__(self) -> str:
+        return f'{self.stacks}'
@@ -0,0 +1,157 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import time
+
+from components.card import Card
+
+if TYPE_CHECKING:
+    from components.player import Player, Trade
+
+ACTOR = 0
+OTHER = 1
+
+# the side receiving the card of each slot: like Player.trade A B B A, then one more card each way
+SLOTS = (ACTOR, OTHER, OTHER, ACTOR, ACTOR, OTHER)
+# calamities can only be slipped in with the last card of each side
+CALAMITY_SLOTS = (4, 5)
+
+# cards the actor gains and gives
+State = Tuple[Tuple[Card, ...], Tuple[Card, ...]]
+# value of the trade for both sides together and its cards
+Composition = Tuple[int, State]
+
+
+def willing(player: Player, wanted: List[Card]) -> Dict[Card, int]:
+    # cards the player parts with: outside its priority and full sets, plus what the partner asked for
+    return {card: item[2] for card, item in player.handcards.values_without_full_sets().items()
+            if card.tradeable and (card not in player.priority or card in wanted)}
+
+
+class BeamComposer():
+    # searches the three cards of each side with a beam over the slots, keeping the best complete trade found.
+    # a trade needs to raise the hand value of the actor and must not lower the one of its partner
+    def __init__(self, actor: Player, trade_option: Tuple[Player, List[Card], List[Card], int],
+                 width: int = 8, deadline: float = 0.0) -> None:
+        other, gain_options, give_options, _ = trade_option
+        self.counts = (actor.handcards.counts, other.handcards.counts)
+        # the pool a slot draws from belongs to the side that does not receive the card
+        self.pools = (willing(other, gain_options), willing(actor, give_options or []))
+        if give_options is None:
+            # no priority of the partner can be served, any other card of value opens the actor's side
+            give_options = [card for card in self.pools[OTHER] if card.value > 0 and card is not gain_options[0]]
+        self.openers = (set(gain_options), set(give_options))
+        self.width = width
+        self.deadline = time.perf_counter() + deadline if deadline else None
+        # value change of a side per card and count change, shared by all states
+        self.changes: Dict[Tuple[int, Card, int], int] = {}
+        self.best: Tuple[int, State] = None
+
+    def change(self, side: int, card: Card, delta: int) -> int:
+        key = (side, card, delta)
+        if key not in self.changes:
+            count = self.counts[side].get(card, 0)
+            self.changes[key] = card.set_value(count + delta) - card.set_value(count) if card.value > 0 else 0
+        return self.changes[key]
+
+    def deltas(self, state: State) -> Tuple[Dict[Card, int], Dict[Card, int]]:
+        deltas: Tuple[Dict[Card, int], Dict[Card, int]] = ({}, {})
+        for side, cards in enumerate(state):
+            for card in cards:
+                deltas[side][card] = deltas[side].get(card, 0) + 1
+                deltas[1 - side][card] = deltas[1 - side].get(card, 0) - 1
+        return deltas
+
+    def values(self, state: State) -> Tuple[int, int]:
+        return tuple(sum(self.change(side, card, delta) for card, delta in deltas.items())
+                     for side, deltas in enumerate(self.deltas(state)))
+
+    def bound(self, state: State, values: Tuple[int, int], depth: int) -> int:
+        # no side loses more by giving, and all remaining cards of a side could go to its best set,
+        # which is never worse than splitting them, since set values grow with the square of the count
+        deltas = self.deltas(state)
+        bound = sum(values)
+        for side in (ACTOR, OTHER):
+            remaining = SLOTS[depth + 1:].count(side)
+            if remaining:
+                bound += max((self.change(side, card, deltas[side].get(card, 0) + remaining) -
+                              self.change(side, card, deltas[side].get(card, 0))
+                              for card in self.pools[side]), default=0)
+        return bound
+
+    def candidates(self, state: State, depth: int) -> List[Card]:
+        side = SLOTS[depth]
+        cards = []
+        for card, count in self.pools[side].items():
+            # the pool runs out, and a card type never goes both ways
+            if state[side].count(card) >= count or card in state[1 - side]:
+                continue
+            if depth < 2 and card not in self.openers[depth]:
+                continue
+            if card.value < 0 and depth not in CALAMITY_SLOTS:
+                continue
+            cards.append(card)
+        return sorted(cards, key=lambda x: x.id)
+
+    def extend(self, state: State, depth: int, card: Card) -> State:
+        side = SLOTS[depth]
+        return tuple(cards + (card,) if index == side else cards for index, cards in enumerate(state))
+
+    def offer(self, state: State) -> None:
+        values = self.values(state)
+        if values[ACTOR] > 0 and values[OTHER] >= 0 and (self.best is None or sum(values) > self.best[0]):
+            self.best = (sum(values), state)
+
+    def complete(self, state: State, depth: int) -> None:
+        # fill the remaining slots with the best card each, so that there is a trade as early as possible
+        for next_depth in range(depth + 1, len(SLOTS)):
+            cards = self.candidates(state, next_depth)
+            if not cards:
+                return
+            state = max((self.extend(state, next_depth, card) for card in cards), key=lambda x: sum(self.values(x)))
+        self.offer(state)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def search(self) -> Composition:
+        beam: List[State] = [((), ())]
+        for depth in range(len(SLOTS)):
+            children: Dict[Tuple[Tuple[int, ...], Tuple[int, ...]], State] = {}
+            for state in beam:
+                for card in self.candidates(state, depth):
+                    child = self.extend(state, depth, card)
+                    children.setdefault(tuple(tuple(sorted(card.id for card in cards)) for cards in child), child)
+                if self.expired():
+                    break
+
+            if depth == len(SLOTS) - 1:
+                for child in children.values():
+                    self.offer(child)
+                break
+            scored = []
+            for key, child in children.items():
+                values = self.values(child)
+                if self.best is None or self.bound(child, values, depth) > self.best[0]:
+                    scored.append((-sum(values), key, child))
+            beam = [child for _, _, child in sorted(scored)[:self.width]]
+            if not beam:
+                break
+            self.complete(beam[0], depth)
+            if self.expired():
+                break
+        return self.best
+
+
+def compose(actor: Player, trade_option: Tuple[Player, List[Card], List[Card], int],
+            width: int = 8, deadline: float = 0.0) -> Composition:
+    # the best trade both sides accept, None if there is none. nothing is exchanged yet
+    return BeamComposer(actor, trade_option, width, deadline).search()
+
+
+def execute(actor: Player, other: Player, state: State) -> Trade:
+    gain, give = list(state[ACTOR]), list(state[OTHER])
+    for card in gain:
+        other.handcards.remove(card)
+    for card in give:
+        actor.handcards.remove(card)
+    return actor.exchange(other, gain, give)
@@ -0,0 +1,45 @@
+from typing import Dict, List, Tuple
+
+# exact matching up to this many players, 2^n states; greedy for larger tables
+EXACT_LIMIT = 12
+
+Edge = Tuple[int, int]
+
+
+def max_weight_matching(count: int, weights: Dict[Edge, float]) -> List[Edge]:
+    if count <= EXACT_LIMIT:
+        return exact_matching(count, weights)
+    return greedy_matching(weights)
+
+
+def exact_matching(count: int, weights: Dict[Edge, float]) -> List[Edge]:
+    neighbours: List[List[Tuple[int, float]]] = [[] for _ in range(count)]
+    for (first, second), weight in weights.items():
+        neighbours[first].append((second, weight))
+        neighbours[second].append((first, weight))
+
+    # best[mask]: weight and edges of the best matching among the players in mask.
+    # the lowest player of a mask either stays unmatched or is matched to one of its neighbours
+    best: List[Tuple[float, Tuple[Edge, ...]]] = [(0.0, ())] * (1 << count)
+    for mask in range(1, 1 << count):
+        lowest = (mask & -mask).bit_length() - 1
+        rest = mask & ~(1 << lowest)
+        weight, edges = best[rest]
+        for other, edge_weight in neighbours[lowest]:
+            if rest >> other & 1:
+                candidate = best[rest & ~(1 << other)]
+                if candidate[0] + edge_weight > weight:
+                    weight = candidate[0] + edge_weight
+                    edges = candidate[1] + ((lowest, other),)
+        best[mask] = (weight, edges)
+    return list(best[-1][1])
+
+
+def greedy_matching(weights: Dict[Edge, float]) -> List[Edge]:
+    matched = set()
+    edges = []
+    for (first, second), weight in sorted(weights.items(), key=lambda x: (-x[1], x[0])):
+        if weight > 0 and first not in matched and second not in matched:
+            matched.update((first, second))
+            edges.append((first, second))
+    return edges
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import importlib
+
+from components.card import Card
+from components.player import Player
+
+numpy = None
+NUMPY_MISSING = False
+
+
+def available() -> bool:
+    # numpy takes longer to import than the whole game, only the matrix engine pays for it
+    global numpy, NUMPY_MISSING  # pylint: disable=W0603
+    if numpy is None and not NUMPY_MISSING:
+        try:
+            numpy = importlib.import_module('numpy')
+        except ImportError:
+            NUMPY_MISSING = True
+    return numpy is not None
+
+
+class TradeMatrix():
+    # rows are players, columns are the card types held by any of them
+    def __init__(self, players: List[Player]) -> None:
+        cards: List[Card] = []
+        for player in players:
+            cards.extend(card for card in player.handcards.types() if card not in cards)
+
+        self.players = players
+        self.rows = {player: row for row, player in enumerate(players)}
+        self.columns = {card: column for column, card in enumerate(cards)}
+        self.values = numpy.array([card.value for card in cards], dtype=numpy.int64)
+        self.max_counts = numpy.array([card.max_count for card in cards], dtype=numpy.int64)
+
+        self.allocate((len(players), len(cards)))
+        self.versions = [None] * len(players)
+
+        for player in players:
+            self.update_row(player)
+        self.calc_scores()
+
+    def allocate(self, shape: Tuple[int, int]) -> None:
+        self.counts = numpy.zeros(shape, dtype=numpy.int64)
+        self.offer = numpy.zeros(shape, dtype=numpy.int64)
+        self.priority = numpy.zeros(shape, dtype=bool)
+        self.scores = None
+
+    def update_row(self, player: Player) -> None:
+        row = self.rows[player]
+        self.versions[row] = player.version
+        self.counts[row] = 0
+        self.offer[row] = 0
+        self.priority[row] = False
+        for card, count in player.handcards.counts.items():
+            self.counts[row, self.columns[card]] = count
+        for card in player.offer:
+            self.offer[row, self.columns[card]] += 1
+        for card in player.priority:
+            self.priority[row, self.columns[card]] = True
+
+    def refresh(self) -> None:
+        # rebuild the rows of players that changed since they were last read
+        changed = [player for row, player in enumerate(self.players) if self.versions[row] != player.version]
+        for player in changed:
+            self.update_row(player)
+        if changed:
+            self.calc_scores([self.rows[player] for player in changed])
+
+    def restamp(self, old_versions: Dict[Player, int]) -> None:
+        for player, version in old_versions.items():
+            row = self.rows[player]
+            if self.versions[row] == version:
+                self.versions[row] = player.version
+
+    def passes(self, rows: List[int] = None) -> List[Tuple[numpy.ndarray, numpy.ndarray]]:
+        # (actors, others) to score: every pair, or only the pairs a changed player takes part in
+        everyone = numpy.arange(len(self.players))
+        if rows is None or self.scores is None:
+            return [(everyone, everyone)]
+        rows = numpy.array(rows)
+        return [(rows, everyone), (everyone, rows)]
+
+    def calc_scores(self, rows: List[int] = None) -> None:
+        pairs = self.passes(rows)
+        if self.scores is None:
+            self.scores = numpy.full((len(self.players), len(self.players)), -numpy.inf)
+        for actors, others in pairs:
+            self.scores[numpy.ix_(actors, others)] = score_pairs(
+                self.counts, self.offer, self.priority, self.values, self.max_counts, actors, others)
+
+    def best_partner(self, actor: Player, others: List[Player]) -> Player:
+        if not others:
+            return None
+        scores = self.scores[self.rows[actor], [self.rows[other] for other in others]]
+        index = int(numpy.argmax(scores))
+        if scores[index] == -numpy.inf:
+            return None
+        return others[index]
+
+    def close(self) -> None:
+        # only the shared matrix of components.trade_parallel holds resources beyond the phase
+        pass
+
+
+def eligible(counts: numpy.ndarray, max_counts: numpy.ndarray) -> numpy.ndarray:
+    # at least three cards outside of full sets
+    return numpy.where(counts == max_counts, 0, counts).sum(axis=1) >= 3
+
+
+def score_pairs(counts: numpy.ndarray, offer: numpy.ndarray, priority: numpy.ndarray, values: numpy.ndarray,
+                max_counts: numpy.ndarray, actors: numpy.ndarray, others: numpy.ndarray) -> numpy.ndarray:
+    # mirrors Player.evaluate_offer for the rows in actors against the rows in others
+    actor_counts = counts[actors]
+    card_values = numpy.where(actor_counts == max_counts, actor_counts * values, (2 * actor_counts + 1) * values)
+    card_values[actor_counts == 0] = 0
+
+    # gain[actor, other, card]: cards other offers that actor wants and other does not
+    gain = offer[others][numpy.newaxis, :, :] * \
+        (priority[actors][:, numpy.newaxis, :] & ~priority[others][numpy.newaxis, :, :])
+    gain_value = (gain * card_values[:, numpy.newaxis, :]).sum(axis=2)
+    has_gain = (gain > 0).any(axis=2)
+
+    # give[actor, other, card]: cards actor offers that other wants and are not gained
+    give = (offer[actors][:, numpy.newaxis, :] > 0) & priority[others][numpy.newaxis, :, :] & (gain == 0)
+    has_give = give.any(axis=2)
+
+    scores = numpy.where(has_give, gain_value, gain_value * 0.5)
+    valid = has_gain & eligible(actor_counts, max_counts)[:, numpy.newaxis] & \
+        eligible(counts[others], max_counts)[numpy.newaxis, :] & (actors[:, numpy.newaxis] != others[numpy.newaxis, :])
+    return numpy.where(valid, scores, -numpy.inf)
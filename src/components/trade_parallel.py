@@ -0,0 +1,155 @@
+from __future__ import annotations
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Tuple
+import atexit
+import multiprocessing
+import multiprocessing.pool
+import os
+
+from components.player import Player
+import components.trade_matrix
+from components.trade_matrix import TradeMatrix, score_pairs
+
+# pairs times card types a worker task has to cover at least, smaller tasks cost more in messages than they save
+MIN_WORK = 250000
+
+# name, shape and dtype of the arrays in the shared buffer, widest first so that every array stays aligned
+LAYOUT = (
+    ('values', 'cards', 'int64'),
+    ('max_counts', 'cards', 'int64'),
+    ('counts', 'hands', 'int64'),
+    ('offer', 'hands', 'int64'),
+    ('scores', 'pairs', 'float64'),
+    ('priority', 'hands', 'bool'),
+)
+
+# name of the buffer -> buffer and arrays, attached by a worker
+Attached = Tuple[str, SharedMemory, Dict]
+
+
+def shapes(players: int, cards: int) -> Dict[str, Tuple[int, ...]]:
+    return {'cards': (cards,), 'hands': (players, cards), 'pairs': (players, players)}
+
+
+def buffer_size(players: int, cards: int) -> int:
+    numpy = components.trade_matrix.numpy
+    return sum(int(numpy.prod(shapes(players, cards)[shape])) * numpy.dtype(dtype).itemsize
+               for _, shape, dtype in LAYOUT)
+
+
+def views(buffer: memoryview, players: int, cards: int) -> Dict:
+    numpy = components.trade_matrix.numpy
+    arrays = {}
+    offset = 0
+    for name, shape, dtype in LAYOUT:
+        arrays[name] = numpy.ndarray(shapes(players, cards)[shape], dtype=dtype, buffer=buffer, offset=offset)
+        offset += arrays[name].nbytes
+    return arrays
+
+
+ATTACHED: Attached = None
+
+
+def score_block(task: Tuple[str, int, int, List[int], List[int]]) -> None:
+    # runs in a worker, only the name of the buffer and the rows of the pairs to score are sent
+    global ATTACHED  # pylint: disable=W0603
+    numpy = components.trade_matrix.numpy
+    name, players, cards, actors, others = task
+    if ATTACHED is None or ATTACHED[0] != name:
+        if ATTACHED is not None:
+            # the views have to be gone before the buffer of the previous phase can be closed
+            memory = ATTACHED[1]
+            ATTACHED = None
+            memory.close()
+        memory = SharedMemory(name)
+        ATTACHED = (name, memory, views(memory.buf, players, cards))
+    arrays = ATTACHED[2]
+    actors, others = numpy.array(actors), numpy.array(others)
+    arrays['scores'][numpy.ix_(actors, others)] = score_pairs(
+        arrays['counts'], arrays['offer'], arrays['priority'], arrays['values'], arrays['max_counts'], actors, others)
+
+
+POOL: multiprocessing.pool.Pool = None
+POOL_WORKERS = 0
+
+
+def worker_pool(workers: int) -> multiprocessing.pool.Pool:
+    # started on first use and kept for the following trade phases
+    global POOL, POOL_WORKERS  # pylint: disable=W0603
+    if POOL is None or POOL_WORKERS != workers:
+        shutdown()
+        POOL = multiprocessing.Pool(workers, initializer=components.trade_matrix.available)
+        POOL_WORKERS = workers
+    return POOL
+
+
+def shutdown() -> None:
+    global POOL  # pylint: disable=W0603
+    if POOL is not None:
+        POOL.terminate()
+        POOL.join()
+        POOL = None
+
+
+atexit.register(shutdown)
+
+
+class SharedTradeMatrix(TradeMatrix):
+    # hand counts, offers, priorities and scores live in one shared buffer. the game process publishes the rows
+    # of players that traded, workers score blocks of the pairs they take part in, no Player or Card is pickled
+    def __init__(self, players: List[Player], workers: int = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.memory: SharedMemory = None
+        self.arrays: Dict = None
+        super().__init__(players)
+
+    def allocate(self, shape: Tuple[int, int]) -> None:
+        players, cards = shape
+        # an empty buffer can not be created
+        self.memory = SharedMemory(create=True, size=max(1, buffer_size(players, cards)))
+        self.arrays = views(self.memory.buf, players, cards)
+        self.arrays['values'][:] = self.values
+        self.arrays['max_counts'][:] = self.max_counts
+        self.values = self.arrays['values']
+        self.max_counts = self.arrays['max_counts']
+        self.counts = self.arrays['counts']
+        self.offer = self.arrays['offer']
+        self.priority = self.arrays['priority']
+        self.scores = self.arrays['scores']
+        self.scores[:] = -components.trade_matrix.numpy.inf
+        self.counts[:] = 0
+        self.offer[:] = 0
+        self.priority[:] = False
+
+    def tasks(self, rows: List[int] = None) -> List[Tuple[str, int, int, List[int], List[int]]]:
+        numpy = components.trade_matrix.numpy
+        players, cards = self.counts.shape
+        tasks = []
+        for actors, others in self.passes(rows):
+            count = min(self.workers, len(actors) * len(others) * cards // MIN_WORK)
+            # the longer side of a pass is split, after a trade that is everyone against the two traders
+            if len(actors) >= len(others):
+                tasks.extend((self.memory.name, players, cards, block.tolist(), others.tolist())
+                             for block in numpy.array_split(actors, max(1, count)))
+            else:
+                tasks.extend((self.memory.name, players, cards, actors.tolist(), block.tolist())
+                             for block in numpy.array_split(others, max(1, count)))
+        return tasks
+
+    def calc_scores(self, rows: List[int] = None) -> None:
+        tasks = self.tasks(rows)
+        # a pool can not be started from the daemonic workers of the simulation tools
+        if len(tasks) <= len(self.passes(rows)) or multiprocessing.current_process().daemon:
+            super().calc_scores(rows)
+            return
+        worker_pool(self.workers).map(score_block, tasks)
+
+    def close(self) -> None:
+        if self.memory is None:
+            return
+        memory = self.memory
+        self.memory = None
+        self.arrays = None
+        self.values = self.max_counts = self.counts = self.offer = self.priority = self.scores = None
+        memory.close()
+        memory.unlink()
@@ -0,0 +1 @@
+# pytest puts this directory on the path, so that tests import the game modules like startup.py does
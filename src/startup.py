@@ -1,11 +1,18 @@
 import argparse
-import json
 from pathlib import Path
-import jsonpickle
+import random
 
+import components.autosave
+import components.deck
 import components.game
-import components.card
-import components.player
+import components.history
+import components.policy
+import components.savegame
+import util.events
+import util.interaction
+import util.profiling
+import util.replay
+import util.texts
 
 
 def parse_args() -> argparse.ArgumentParser:
@@ -14,9 +21,75 @@ def parse_args() -> argparse.ArgumentParser:
     parser.add_argument(
         '-p', '--playercount', help='number of players', type=int, default=5)
     parser.add_argument(
-        '-m', '--map', help='east or west map', type=str, default='west')
+        '-m', '--map', help='east or west map, the shipped card configuration only has cards for west',
+        type=str, default='west')
     parser.add_argument(
-        '-l', '--load', help='provide the path to a save file to continue a game', type=str)
+        '-l', '--load', help='provide the path to a save file or a save history (temp/history) to continue a game',
+        type=str)
+    parser.add_argument(
+        '-r', '--round', help='round to load from a save history (defaults to the latest)', type=int)
+    parser.add_argument(
+        '--trade-engine', help='queue: evaluate every pair in Python, matrix: vectorized with NumPy if installed, '
+        'rescores the pairs of the players that traded and is slower than queue at 5 to 9 players, '
+        'matching: trade maximum-weight sets of disjoint pairs, '
+        'parallel: like matrix, with large scoring passes split over worker processes and shared memory. '
+        'A worker task covers at least 250000 pairs times card types, so 5 to 9 player games stay on one core',
+        type=str, choices=['queue', 'matrix', 'matching', 'parallel'], default='queue')
+    parser.add_argument(
+        '--trade-workers', help='worker processes of the parallel trade engine (defaults to one per core)', type=int)
+    parser.add_argument(
+        '--trade-composer', help='greedy: fill the three cards of each side one after another, '
+        'beam: search the best exchange that does not lower the partner\'s hand value for every pair and trade '
+        'with the partner of the best one, the scores of the matrix and parallel engines are not used',
+        type=str, choices=['greedy', 'beam'], default='greedy')
+    parser.add_argument(
+        '--trade-beam-width', help='states kept per card of the beam composer', type=int, default=8)
+    parser.add_argument(
+        '--trade-deadline', help='milliseconds the beam composer may take per pair, 0 for no limit. '
+        'A limit makes the trades depend on the speed of the machine', type=float, default=0.0)
+    parser.add_argument(
+        '--keep-saves', help='number of most recent autosaves to keep (defaults to all)', type=int)
+    parser.add_argument(
+        '--save-compression', help='gzip level 1-9 for autosaves, 0 writes them uncompressed',
+        type=int, choices=range(10), default=0)
+    parser.add_argument(
+        '--history-interval', help='full snapshot every this many rounds of the save history, deltas in between. '
+        '0 disables the history', type=int, default=10)
+    parser.add_argument(
+        '--profile', help='print timings and trade counters after each round', action='store_true')
+    parser.add_argument(
+        '--profile-output', help='additionally dump cProfile statistics to this file', type=str)
+    parser.add_argument(
+        '-s', '--simulate', help='number of headless games to simulate per player count and map', type=int)
+    parser.add_argument(
+        '--simulate-playercounts', help='player counts to simulate (defaults to --playercount)', type=int, nargs='+')
+    parser.add_argument(
+        '--simulate-maps', help='maps to simulate (defaults to --map), the shipped card configuration only has '
+        'cards for west', type=str, nargs='+')
+    parser.add_argument(
+        '--rounds', help='number of rounds per simulated game and of a game with the policy input', type=int,
+        default=10)
+    parser.add_argument(
+        '--processes', help='number of worker processes for simulations', type=int)
+    parser.add_argument(
+        '--seed', help='seed of the game (random by default) or of the first simulated game', type=int)
+    parser.add_argument(
+        '--input', help='interactive: ask at the table, scripted: read answers from --script, '
+        'policy: decide automatically. Only interactive waits for the board',
+        type=str, choices=['interactive', 'scripted', 'policy'])
+    parser.add_argument(
+        '--script', help='file with one answer per line for the scripted input', type=str)
+    parser.add_argument(
+        '--record', help='record every answer of this game to a replay file', type=str)
+    parser.add_argument(
+        '--replay', help='replay a recorded game headless instead of asking for input', type=str)
+    parser.add_argument(
+        '--events', help='append trades, failed trades, calamities and discards to this SQLite database', type=str)
+    parser.add_argument(
+        '--verbosity', help='game_info: phases only, info: also hands and results, action: everything',
+        type=str, choices=list(util.texts.LEVELS), default='action')
+    parser.add_argument(
+        '-q', '--quiet', help='print nothing but the questions of the game', action='store_true')
 
     return parser
 
@@ -35,32 +108,133 @@ def parse_args() -> argparse.ArgumentParser:
 #     print('_________EVALUATION_END____')
 
 
-def load_game(savefile: Path) -> components.game.Game:
-    with savefile.open() as file:
-        json_str = json.load(file)
-    game = jsonpickle.decode(json_str, classes=(
-        components.game.Game, components.player.Player, components.card.Card), keys=True)
+def load_game(savefile: Path, game_round: int = None) -> components.game.Game:
+    if components.history.is_history(savefile):
+        return components.history.SaveHistory(savefile).load(game_round)
+    if game_round is not None:
+        raise ValueError(f'{savefile} is a single save, --round needs a save history')
+    return components.savegame.load(savefile)
+
+
+def input_provider(options: argparse.Namespace) -> util.interaction.InputProvider:
+    if options.input == 'policy':
+        return components.policy.PolicyProvider(random.Random(options.seed))
+    if options.input == 'scripted':
+        answers = Path(options.script).read_text(encoding='utf-8').splitlines() if options.script else []
+        return util.interaction.ScriptedProvider(answers)
+    return util.interaction.InteractiveProvider()
+
+
+def simulate(options: argparse.Namespace) -> None:
+    import tools.simulation  # pylint: disable=C0415
+
+    maps = options.simulate_maps or [options.map]
+    known = components.deck.get_maps()
+    missing = [game_map for game_map in maps if game_map not in known]
+    if missing:
+        print(f'The card configuration has no cards for the map {", ".join(missing)}, '
+              f'only for {", ".join(known)}.\nClosing.')
+        return
+    playercounts = options.simulate_playercounts or [options.playercount]
+    try:
+        # decks are cached, so checking them up front costs nothing later
+        for playercount in playercounts:
+            for game_map in maps:
+                components.deck.get_deck(playercount, game_map)
+    except ValueError as error:
+        print(f'Invalid card configuration: {error}.\nClosing.')
+        return
 
-    return game
+    summary = tools.simulation.run_simulations(
+        components.deck.CONFIG_PATH, options.simulate, playercounts, maps,
+        seed=options.seed if options.seed is not None else 0, rounds=options.rounds, processes=options.processes,
+        trade_engine=options.trade_engine, events_path=options.events,
+        trade_composer=options.trade_composer, trade_beam_width=options.trade_beam_width,
+        trade_deadline=options.trade_deadline)
+
+    for (playercount, game_map), result in summary.items():
+        print(f'{playercount} players, {game_map} map: {result["games"]} games, '
+              f'{result["trades_per_round"]:.2f} trades/round, '
+              f'hand value {result["hand_value"]:.1f}, spent {result["spent"]:.1f}, '
+              f'{result["calamities"]:.1f} calamities, {result["duration"]:.3f}s/game')
+
+
+def print_result(game: components.game.Game, message: str) -> None:
+    util.texts.game_info(message)
+    for player in game.players:
+        util.texts.info(f'{player.name}:')
+        player.print_handcards()
 
 
 def main():
     parser = parse_args()
     options = parser.parse_args()
 
+    if options.profile or options.profile_output:
+        util.profiling.enable(options.profile_output)
+    if options.quiet:
+        util.texts.use(util.texts.NullSink())
+    else:
+        util.texts.use(util.texts.Sink(util.texts.LEVELS[options.verbosity]))
+
+    if options.simulate:
+        simulate(options)
+        return
+
+    components.autosave.configure(
+        Path('temp'), keep=options.keep_saves, compression=options.save_compression,
+        history_interval=options.history_interval)
+    if options.events:
+        util.events.configure(Path(options.events))
+
+    if options.replay:
+        # the replay knows how its game was started
+        replay = util.replay.replay(Path(options.replay))
+        for key in ['playercount', 'map', 'seed', 'load', 'round']:
+            setattr(options, key, replay.header.get(key))
+        options.input = replay.header.get('input', 'interactive')
+    if options.seed is None:
+        options.seed = random.randrange(2**32)
+    if options.input is None:
+        options.input = 'scripted' if options.script else 'interactive'
+    util.interaction.use(input_provider(options))
+    if options.record:
+        util.replay.record(Path(options.record), {
+            key: getattr(options, key) for key in ['playercount', 'map', 'seed', 'load', 'round', 'input']})
+
     if options.load:
         savefile = Path(options.load)
         if savefile.exists():
-            game = load_game(savefile)
+            try:
+                game = load_game(savefile, options.round)
+            except ValueError as error:
+                print(f'Could not load {savefile}: {error}.\nClosing.')
+                return
+            game.apply_options(options)
         else:
             print('Please provide a correct path to a save file.\nClosing.')
+            return
     else:
-        with open('./src/config.conf', encoding='utf-8') as config:
-            config = json.load(config)
-        game = components.game.Game(config, options)
+        try:
+            deck = components.deck.get_deck(options.playercount, options.map)
+        except ValueError as error:
+            print(f'Invalid card configuration: {error}.\nClosing.')
+            return
+        game = components.game.Game(deck, options)
 
-    while True:
-        game.game_loop()
+    try:
+        if options.input == 'policy':
+            # nobody at the table ends a policy game, it stops after --rounds rounds like a simulated one
+            for _ in range(options.rounds):
+                game.game_loop()
+            print_result(game, f'Policy game finished after {options.rounds} rounds')
+        else:
+            while True:
+                game.game_loop()
+    except util.replay.ReplayFinished as finished:
+        print_result(game, f'Replay finished in round {game.round}: {finished}')
+    except util.interaction.ScriptFinished as finished:
+        print_result(game, f'Script finished in round {game.round}: {finished}')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,35 @@
+from pathlib import Path
+import sqlite3
+import threading
+
+import util.events
+
+
+def flush_within(log: util.events.EventLog, seconds: float) -> bool:
+    thread = threading.Thread(target=log.flush, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return not thread.is_alive()
+
+
+def test_writer_survives_failing_connect(monkeypatch, tmp_path: Path) -> None:
+    def connect(self):
+        raise OSError('no database here')
+
+    monkeypatch.setattr(util.events.EventLog, 'connect', connect)
+    log = util.events.EventLog(tmp_path / 'events.db', batch_size=10)
+    for _ in range(2):
+        log.emit((1, 1, 'trade', 'Egypt', 'Crete', ('ochre',), ('clay',), 1, 2, 3, 4, None))
+        assert flush_within(log, 5)
+    assert log.thread.is_alive()
+    log.close()
+
+
+def test_events_are_written(tmp_path: Path) -> None:
+    log = util.events.EventLog(tmp_path / 'events.db')
+    log.emit((1, 2, 'trade', 'Egypt', 'Crete', ('ochre',), ('clay', 'clay'), 1, 2, 3, 4, None))
+    log.close()
+    connection = sqlite3.connect(tmp_path / 'events.db')
+    assert connection.execute('SELECT round, gained, given FROM events').fetchall() == \
+        [(2, '["ochre"]', '["clay", "clay"]')]
+    connection.close()
@@ -0,0 +1,72 @@
+from argparse import Namespace
+from typing import List, Tuple
+
+import pytest
+
+from components.deck import get_deck
+from components.game import Game
+from components.player import evaluate
+from tools.benchmark import deal_game
+import components.trade_composer
+import util.texts as util
+
+
+def dealt_game(seed: int) -> Game:
+    game = deal_game(get_deck(7, 'west'), Namespace(playercount=7, map='west', trade_engine='queue'), seed, 4)
+    game.trade_composer = 'beam'
+    return game
+
+
+def record_trades(monkeypatch) -> List[Tuple[int, int, int, int]]:
+    # hand values of actor and partner before and after every executed beam trade
+    trades = []
+    execute = components.trade_composer.execute
+
+    def recording(actor, other, state):
+        before = (evaluate(actor.handcards), evaluate(other.handcards))
+        trade = execute(actor, other, state)
+        trades.append((before[0], evaluate(actor.handcards), before[1], evaluate(other.handcards)))
+        return trade
+
+    monkeypatch.setattr(components.trade_composer, 'execute', recording)
+    return trades
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_beam_trade_never_lowers_partner(monkeypatch, seed: int) -> None:
+    trades = record_trades(monkeypatch)
+    game = dealt_game(seed)
+    with util.muted():
+        game.phase_7_trade()
+    assert trades
+    for actor_before, actor_after, other_before, other_after in trades:
+        assert actor_after > actor_before
+        assert other_after >= other_before
+
+
+def test_deadline_still_returns_trades(monkeypatch) -> None:
+    trades = record_trades(monkeypatch)
+    game = dealt_game(0)
+    # expires right after the first level of the search, the greedy completion still offers a trade
+    game.trade_deadline = 1e-9
+    with util.muted():
+        game.phase_7_trade()
+    assert trades
+    assert all(other_after >= other_before for _, _, other_before, other_after in trades)
+
+
+def test_compose_with_deadline() -> None:
+    game = dealt_game(0)
+    game.prepare_trading_queue()
+    composed = 0
+    for actor in game.players:
+        for other in game.players:
+            offer = actor.evaluate_offer(other) if other is not actor else None
+            if offer is None:
+                continue
+            composition = components.trade_composer.compose(actor, offer, deadline=1e-9)
+            if composition is not None:
+                composed += 1
+                gain, give = composition[1]
+                assert gain and give
+    assert composed
@@ -0,0 +1,241 @@
+from __future__ import annotations
+from argparse import ArgumentParser
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List
+import json
+import sqlite3
+import sys
+
+import components.savegame
+import components.trade_matrix
+
+if TYPE_CHECKING:
+    import numpy
+
+LOCATIONS = ['hands', 'stacks', 'discard pile']
+# autosaves written before the compact format
+LEGACY_PATTERN = 'autosave_round_*.json'
+
+
+def parse_args() -> ArgumentParser:
+    parser = ArgumentParser(
+        description='Card distributions and hand values over saves and the trade event store')
+    parser.add_argument(
+        '-s', '--saves', help='directories searched recursively for compact saves and legacy json autosaves',
+        type=str, nargs='*', default=[])
+    parser.add_argument(
+        '-e', '--events', help='SQLite database written with --events', type=str)
+    parser.add_argument(
+        '-o', '--output', help='write the report as JSON to this file', type=str)
+
+    return parser
+
+
+def find_saves(directories: List[str]) -> Iterator[Path]:
+    for directory in directories:
+        yield from sorted([*Path(directory).rglob(f'*{components.savegame.SUFFIX}'),
+                           *Path(directory).rglob(LEGACY_PATTERN)])
+
+
+class SaveStatistics():
+    # totals over all saves, indexed by card name and player name, one save is read at a time
+    def __init__(self) -> None:
+        numpy = components.trade_matrix.numpy
+        self.cards: Dict[str, int] = {}
+        self.locations = numpy.zeros((0, len(LOCATIONS)), dtype=numpy.int64)
+        self.player_cards: Dict[str, numpy.ndarray] = {}
+        # saves, sum and sum of squares of the hand value
+        self.player_values: Dict[str, numpy.ndarray] = {}
+        # saves, hands, sum and sum of squares of the hand value, handcards, discard pile
+        self.rounds: Dict[int, numpy.ndarray] = {}
+        self.saves = 0
+        self.legacy = 0
+        self.skipped = 0
+
+    def card_indices(self, names: List[str]) -> numpy.ndarray:
+        numpy = components.trade_matrix.numpy
+        for name in names:
+            self.cards.setdefault(name, len(self.cards))
+        if len(self.cards) > len(self.locations):
+            grow = len(self.cards) - len(self.locations)
+            self.locations = numpy.pad(self.locations, ((0, grow), (0, 0)))
+            for name, counts in self.player_cards.items():
+                self.player_cards[name] = numpy.pad(counts, (0, grow))
+        return numpy.array([self.cards[name] for name in names], dtype=numpy.intp)
+
+    def add(self, data: bytes) -> None:
+        numpy = components.trade_matrix.numpy
+        header, arrays = components.savegame.decode_tables(data)
+        indices = self.card_indices([card[0] for card in header['cards']])
+        values = numpy.array([card[1] for card in header['cards']], dtype=numpy.int64)
+        # only positive cards count for the hand value, calamities do not lower it
+        positive = numpy.where(values > 0, values, 0)
+
+        def counts(ids) -> numpy.ndarray:
+            return numpy.bincount(numpy.frombuffer(ids, dtype=numpy.uint16), minlength=len(indices))
+
+        stacks = len(header['stacks'])
+        players = header['players']
+        hands = numpy.stack([counts(arrays[stacks + 3 * index]) for index in range(len(players))])
+        discard_pile = counts(arrays[stacks + 3 * len(players)])
+
+        numpy.add.at(self.locations, (indices, 0), hands.sum(axis=0))
+        numpy.add.at(self.locations, (indices, 1), sum((counts(ids) for ids in arrays[:stacks]), 0))
+        numpy.add.at(self.locations, (indices, 2), discard_pile)
+
+        hand_values = (hands * hands * positive).sum(axis=1)
+        for player, hand, value in zip(players, hands, hand_values):
+            if player['name'] not in self.player_cards:
+                self.player_cards[player['name']] = numpy.zeros(len(self.cards), dtype=numpy.int64)
+                self.player_values[player['name']] = numpy.zeros(3)
+            numpy.add.at(self.player_cards[player['name']], indices, hand)
+            self.player_values[player['name']] += (1, value, value * value)
+
+        game_round = self.rounds.setdefault(header['round'], numpy.zeros(6))
+        game_round += (1, len(players), hand_values.sum(), (hand_values * hand_values).sum(),
+                       hands.sum(), discard_pile.sum())
+        self.saves += 1
+
+    def report(self) -> Dict:
+        names = list(self.cards)
+        return {
+            'saves': self.saves,
+            'legacy': self.legacy,
+            'skipped': self.skipped,
+            'cards': {
+                name: dict(zip(LOCATIONS, self.locations[index].tolist())) for index, name in enumerate(names)
+            },
+            'players': {
+                name: {
+                    'saves': int(values[0]),
+                    **describe(values[0], values[1], values[2]),
+                    'cards': {names[index]: int(count) for index, count in enumerate(self.player_cards[name]) if count},
+                } for name, values in self.player_values.items()
+            },
+            'rounds': {
+                game_round: {
+                    'saves': int(values[0]),
+                    **describe(values[1], values[2], values[3]),
+                    'handcards': values[4] / values[1],
+                    'discard_pile': values[5] / values[0],
+                } for game_round, values in sorted(self.rounds.items())
+            },
+        }
+
+
+def describe(count: float, total: float, squares: float) -> Dict[str, float]:
+    mean = total / count
+    return {'mean': float(mean), 'variance': float(max(0.0, squares / count - mean * mean))}
+
+
+def analyze_saves(directories: List[str]) -> Dict:
+    statistics = SaveStatistics()
+    for path in find_saves(directories):
+        data = components.savegame.read(path)
+        if not data.startswith(components.savegame.MAGIC):
+            # legacy jsonpickle saves are loaded as a whole game and encoded into the same tables
+            try:
+                data = components.savegame.encode(components.savegame.decode_legacy(data))
+            except Exception as error:  # pylint: disable=W0703
+                print(f'Skipping {path}: {error}')
+                statistics.skipped += 1
+                continue
+            statistics.legacy += 1
+        statistics.add(data)
+    return statistics.report()
+
+
+def analyze_events(path: Path) -> Dict:
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    # scalar aggregates are left to SQLite, only the card lists are streamed through Python
+    players: Dict[str, Dict[str, float]] = {}
+    for name, trades, gain in connection.execute(
+            "SELECT name, COUNT(*), SUM(gain) FROM ("
+            "SELECT actor AS name, actor_after - actor_before AS gain FROM events WHERE kind = 'trade' UNION ALL "
+            "SELECT other, other_after - other_before FROM events WHERE kind = 'trade') GROUP BY name ORDER BY name"):
+        players[name] = {'trades': trades, 'gain': gain / trades}
+    for name, failed in connection.execute(
+            "SELECT actor, COUNT(*) FROM events WHERE kind = 'failed_trade' GROUP BY actor"):
+        players.setdefault(name, {'trades': 0, 'gain': 0.0})['failed'] = failed
+
+    rounds = {
+        game_round: {'trades': trades, 'games': games, 'gain': gain / trades}
+        for game_round, trades, games, gain in connection.execute(
+            "SELECT round, COUNT(*), COUNT(DISTINCT game), "
+            "SUM(actor_after - actor_before + other_after - other_before) "
+            "FROM events WHERE kind = 'trade' GROUP BY round ORDER BY round")
+    }
+
+    traded: Counter = Counter()
+    discarded: Counter = Counter()
+    cursor = connection.execute("SELECT kind, gained, given FROM events WHERE kind IN ('trade', 'discard')")
+    for kind, gained, given in cursor:
+        if kind == 'trade':
+            traded.update(json.loads(gained))
+            traded.update(json.loads(given))
+        else:
+            discarded.update(json.loads(given))
+    calamities = dict(connection.execute(
+        "SELECT detail, COUNT(*) FROM events WHERE kind = 'calamity' GROUP BY detail ORDER BY detail").fetchall())
+    connection.close()
+
+    return {
+        'players': players,
+        'rounds': rounds,
+        'traded': dict(traded.most_common()),
+        'discarded': dict(discarded.most_common()),
+        'calamities': calamities,
+    }
+
+
+def print_saves(report: Dict) -> None:
+    print(f'{report["saves"]} saves, {report["legacy"]} of them legacy saves, '
+          f'{report["skipped"]} unreadable saves skipped')
+    for name, locations in report['cards'].items():
+        if any(locations.values()):
+            print(f'    {name:<30} ' + ', '.join(f'{count:>7} in {location}' for location, count in locations.items()))
+    for name, player in report['players'].items():
+        print(f'    {name:<10} hand value {player["mean"]:>7.1f} (var {player["variance"]:.1f})')
+    for game_round, item in report['rounds'].items():
+        print(f'    round {game_round:>3}: {item["saves"]} saves, hand value {item["mean"]:.1f} '
+              f'(var {item["variance"]:.1f}), {item["handcards"]:.1f} cards per hand, '
+              f'{item["discard_pile"]:.1f} discarded')
+
+
+def print_events(report: Dict) -> None:
+    print('events')
+    for name, player in report['players'].items():
+        print(f'    {name:<10} {player["trades"]:>7} trades, gain {player["gain"]:.2f} per trade, '
+              f'{player.get("failed", 0)} rolled back')
+    for game_round, item in report['rounds'].items():
+        print(f'    round {game_round:>3}: {item["trades"] / item["games"]:.2f} trades per game, '
+              f'gain {item["gain"]:.2f} per trade')
+    print('    traded:    ' + ', '.join(f'{name} {count}' for name, count in report['traded'].items()))
+    print('    discarded: ' + ', '.join(f'{name} {count}' for name, count in report['discarded'].items()))
+    print('    calamities: ' + ', '.join(f'{name} {count}' for name, count in report['calamities'].items()))
+
+
+def main() -> None:
+    options = parse_args().parse_args()
+    if not options.saves and not options.events:
+        print('Nothing to analyze, pass --saves or --events.')
+        sys.exit(1)
+
+    report = {}
+    if options.saves:
+        if not components.trade_matrix.available():
+            print('Analyzing saves needs NumPy.')
+            sys.exit(1)
+        report['saves'] = analyze_saves(options.saves)
+        print_saves(report['saves'])
+    if options.events:
+        report['events'] = analyze_events(Path(options.events))
+        print_events(report['events'])
+
+    if options.output:
+        Path(options.output).write_text(json.dumps(report, indent=4), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
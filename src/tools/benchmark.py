@@ -0,0 +1,182 @@
+from __future__ import annotations
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Callable, List, Dict
+import copy
+import json
+import platform
+import random
+import sys
+import time
+
+from components.deck import CONFIG_PATH, DeckDefinition, get_deck, get_maps
+from components.game import Game
+from components.handcards import VALUATIONS, Handcards
+import util.texts as util
+
+
+def parse_args() -> ArgumentParser:
+    parser = ArgumentParser(
+        description='Benchmark hand valuation and trading')
+    parser.add_argument(
+        '-c', '--config', help='path to the card configuration', type=str,
+        default=str(CONFIG_PATH))
+    parser.add_argument(
+        '-p', '--playercounts', help='player counts to benchmark', type=int, nargs='+', default=[5, 6, 7, 8, 9])
+    parser.add_argument(
+        '-m', '--maps', help='maps to benchmark (defaults to every map in the config)', type=str, nargs='+')
+    parser.add_argument(
+        '--trade-engine', help='trade engine used by phase_7_trade', type=str,
+        choices=['queue', 'matrix', 'matching', 'parallel'], default='queue')
+    parser.add_argument(
+        '--seed', help='seed for stacks and dealt hands', type=int, default=0)
+    parser.add_argument(
+        '--repeat', help='number of timed runs, the fastest one counts', type=int, default=5)
+    parser.add_argument(
+        '--rounds', help='number of dealing rounds before measuring', type=int, default=3)
+    parser.add_argument(
+        '-o', '--output', help='write results as JSON to this file', type=str)
+    parser.add_argument(
+        '-b', '--baseline', help='compare against results of an earlier run', type=str)
+    parser.add_argument(
+        '-t', '--threshold', help='relative slowdown that counts as regression', type=float, default=0.1)
+
+    return parser
+
+
+def deal_game(deck: DeckDefinition, options: Namespace, seed: int, rounds: int) -> Game:
+    rng = random.Random(seed)
+    with util.muted():
+        game = Game(deck, Namespace(**vars(options), seed=seed))
+        for round_number in range(rounds):
+            # every player draws one card from each stack up to its number of cities
+            for player in game.players:
+                cities = min(9, max(1, 3 + round_number + rng.randint(-1, 2)))
+                for city in range(cities):
+                    player.handcards.append(game.draw_card_from_stack(city + 1))
+    return game
+
+
+def measure(function: Callable[[], None], prepare: Callable[[], None], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        prepare()
+        VALUATIONS.clear()
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def run_case(deck: DeckDefinition, options: Namespace, seed: int, rounds: int, repeat: int) -> Dict[str, float]:
+    dealt = deal_game(deck, options, seed, rounds)
+    state = {}
+
+    def fresh() -> None:
+        state['game'] = copy.deepcopy(dealt)
+        state['game'].prepare_trading_queue()
+        # seeded parts of the dealt hands, different enough that most valuations miss the cache
+        rng = random.Random(seed)
+        state['hands'] = [rng.sample(cards, rng.randint(1, len(cards)))
+                          for cards in (list(player.handcards) for player in state['game'].players) if cards
+                          for _ in range(100)]
+
+    def bench_valuation() -> None:
+        for cards in state['hands']:
+            Handcards(cards).values_without_full_sets()
+
+    def bench_calc_offer() -> None:
+        for player in state['game'].players:
+            for _ in range(100):
+                player.calc_offer()
+
+    def bench_evaluate_offer() -> None:
+        players = state['game'].players
+        for _ in range(10):
+            for player in players:
+                for other in players:
+                    if other is not player:
+                        player.evaluate_offer(other)
+
+    def bench_trade() -> None:
+        players = state['game'].players
+        for player in players:
+            for other in players:
+                option = player.evaluate_offer(other) if other is not player else None
+                if option is not None:
+                    player.trade(option)
+
+    def bench_phase_7_trade() -> None:
+        with util.muted():
+            state['game'].phase_7_trade()
+
+    return {
+        'valuation': measure(bench_valuation, fresh, repeat),
+        'calc_offer': measure(bench_calc_offer, fresh, repeat),
+        'evaluate_offer': measure(bench_evaluate_offer, fresh, repeat),
+        'trade': measure(bench_trade, fresh, repeat),
+        'phase_7_trade': measure(bench_phase_7_trade, fresh, repeat),
+    }
+
+
+def run_benchmarks(options: Namespace) -> Dict:
+    maps = options.maps or get_maps(Path(options.config))
+    results = {}
+    for game_map in maps:
+        for playercount in options.playercounts:
+            game_options = Namespace(
+                playercount=playercount, map=game_map, trade_engine=options.trade_engine)
+            deck = get_deck(playercount, game_map, Path(options.config))
+            for name, duration in run_case(deck, game_options, options.seed, options.rounds, options.repeat).items():
+                results[f'{name}/{playercount}p/{game_map}'] = duration
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'seed': options.seed,
+            'repeat': options.repeat,
+            'rounds': options.rounds,
+            'trade_engine': options.trade_engine,
+        },
+        'results': results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, duration in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        ratio = duration / previous if previous else float('inf')
+        marker = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            marker = '  REGRESSION'
+        print(f'{name:<32} {previous * 1000:>10.3f}ms -> {duration * 1000:>10.3f}ms  x{ratio:.2f}{marker}')
+    return regressions
+
+
+def main() -> None:
+    options = parse_args().parse_args()
+    results = run_benchmarks(options)
+
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=4), encoding='utf-8')
+
+    if options.baseline:
+        baseline = json.loads(Path(options.baseline).read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, options.threshold)
+        if regressions:
+            print(f'{len(regressions)} benchmarks regressed by more than {options.threshold:.0%}')
+            sys.exit(1)
+    else:
+        for name, duration in results['results'].items():
+            print(f'{name:<32} {duration * 1000:>10.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Dict, List, Tuple
+import statistics
+import subprocess
+import sys
+
+SRC = Path(__file__).resolve().parent.parent
+
+# imported on first use only, startup must not pull them in
+DEFERRED = ['numpy', 'colorama', 'jsonpickle', 'multiprocessing.shared_memory', 'sqlite3']
+
+
+def parse_args() -> ArgumentParser:
+    parser = ArgumentParser(
+        description='Check the import time of the game against a budget')
+    parser.add_argument(
+        '-m', '--module', help='module to import', type=str, default='startup')
+    parser.add_argument(
+        '-b', '--budget', help='allowed cumulative import time of the module in ms', type=float, default=150)
+    parser.add_argument(
+        '-r', '--runs', help='number of imports, the median is checked', type=int, default=5)
+    parser.add_argument(
+        '--top', help='number of slowest modules to list', type=int, default=10)
+    parser.add_argument(
+        '--deferred', help='modules that must not be imported at startup', type=str, nargs='*', default=DEFERRED)
+
+    return parser
+
+
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    # module -> (self, cumulative) import time in µs as reported by -X importtime
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def main() -> None:
+    options = parse_args().parse_args()
+    runs: List[Dict[str, Tuple[int, int]]] = [measure(options.module) for _ in range(options.runs)]
+    total = statistics.median(run[options.module][1] for run in runs) / 1000
+
+    print(f'import {options.module}: {total:.1f}ms (budget {options.budget:.1f}ms)')
+    last = runs[-1]
+    for name, (own, cumulative) in sorted(last.items(), key=lambda x: -x[1][0])[:options.top]:
+        print(f'    {name:<30} self {own / 1000:>6.1f}ms, cumulative {cumulative / 1000:>6.1f}ms')
+
+    failed = False
+    imported = [name for name in options.deferred if name in last]
+    if imported:
+        print(f'imported at startup although deferred: {", ".join(imported)}')
+        failed = True
+    if total > options.budget:
+        print(f'import time exceeds the budget by {total - options.budget:.1f}ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from argparse import Namespace
+from pathlib import Path
+from typing import List, Dict, Tuple
+import multiprocessing
+import os
+import random
+import time
+
+from components.deck import DeckDefinition, get_deck
+from components.game import Game
+from components.player import evaluate
+from components.policy import PolicyProvider
+import util.events as events
+import util.interaction as Requests
+import util.texts as util
+
+
+class SimulatedGame(Game):
+    # the policy provider makes all decisions, the board is only simulated as far as trading needs it
+    def __init__(self, deck: DeckDefinition, options: Namespace, seed: int) -> None:
+        super().__init__(deck, Namespace(**vars(options), seed=seed))
+        self.resolved_calamities = 0
+
+    def phase_9_calamity_resolution(self) -> None:
+        self.resolved_calamities += len(self.calamities)
+        super().phase_9_calamity_resolution()
+
+    def phase_13_ast_alteration(self) -> None:
+        for player in self.players:
+            player.ascend()
+        super().phase_13_ast_alteration()
+
+    def save_game(self) -> None:
+        pass
+
+
+def play_game(job: Tuple[DeckDefinition, Namespace, int, int, str]) -> Dict:
+    deck, options, seed, rounds, events_path = job
+    if events_path and (events.LOG is None or events.LOG.path != Path(events_path)):
+        events.configure(Path(events_path))
+    start = time.perf_counter()
+    with util.muted():
+        policy = Requests.use(PolicyProvider(random.Random(seed)))
+        game = SimulatedGame(deck, options, seed)
+        for _ in range(rounds):
+            game.game_loop()
+    # pool workers do not run exit handlers, so every game hands in its events
+    events.flush()
+
+    return {
+        'playercount': options.playercount,
+        'map': options.map,
+        'seed': seed,
+        'rounds': rounds,
+        'duration': time.perf_counter() - start,
+        'calamities': game.resolved_calamities,
+        'players': {
+            player.name: {
+                'trades': sum(player.trades.values()),
+                'hand_value': evaluate(player.handcards),
+                'spent': policy.spent.get(player, 0),
+            } for player in game.players
+        },
+    }
+
+
+def aggregate(results: List[Dict]) -> Dict[Tuple[int, str], Dict[str, float]]:
+    grouped: Dict[Tuple[int, str], List[Dict]] = {}
+    for result in results:
+        grouped.setdefault(
+            (result['playercount'], result['map']), []).append(result)
+
+    summary = {}
+    for key, games in sorted(grouped.items()):
+        players = [player for game in games for player in game['players'].values()]
+        summary[key] = {
+            'games': len(games),
+            'trades_per_round': sum([player['trades'] for player in players]) / sum([game['rounds'] for game in games]),
+            'hand_value': sum([player['hand_value'] for player in players]) / len(players),
+            'spent': sum([player['spent'] for player in players]) / len(players),
+            'calamities': sum([game['calamities'] for game in games]) / len(games),
+            'duration': sum([game['duration'] for game in games]) / len(games),
+        }
+    return summary
+
+
+def run_simulations(config: Path, games: int, playercounts: List[int], maps: List[str], seed: int = 0,
+                    rounds: int = 10, processes: int = None,
+                    trade_engine: str = 'queue', events_path: str = None, trade_composer: str = 'greedy',
+                    trade_beam_width: int = 8, trade_deadline: float = 0.0) -> Dict[Tuple[int, str], Dict[str, float]]:
+    jobs = [
+        (get_deck(playercount, game_map, config),
+         Namespace(playercount=playercount, map=game_map, trade_engine=trade_engine, trade_composer=trade_composer,
+                   trade_beam_width=trade_beam_width, trade_deadline=trade_deadline),
+         seed + index, rounds, events_path)
+        for playercount in playercounts
+        for game_map in maps
+        for index in range(games)
+    ]
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, len(jobs) // (4 * (processes or os.cpu_count() or 1)))
+        results = pool.map(play_game, jobs, chunksize)
+
+    return aggregate(results)
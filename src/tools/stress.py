@@ -0,0 +1,200 @@
+from __future__ import annotations
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Dict, List
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+from components.game import Game
+from components.handcards import VALUATIONS
+from components.player import evaluate
+from components.stacks import KEYS
+import components.trade_matrix
+import util.texts as util
+
+
+def parse_args() -> ArgumentParser:
+    parser = ArgumentParser(
+        description='Measure how the trade phase scales on synthetic tables beyond the configured decks')
+    parser.add_argument(
+        '-p', '--playercounts', help='numbers of synthetic civilizations', type=int, nargs='+',
+        default=[5, 10, 20, 40])
+    parser.add_argument(
+        '--hand-sizes', help='cards dealt to every player', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument(
+        '--card-types', help='number of synthetic commodities (defaults to enough for the largest table)', type=int)
+    parser.add_argument(
+        '--trade-engines', help='trade engines to measure', type=str, nargs='+',
+        choices=['queue', 'matrix', 'matching', 'parallel'], default=['queue'])
+    parser.add_argument(
+        '--trade-workers', help='worker processes of the parallel trade engine (defaults to one per core)', type=int)
+    parser.add_argument(
+        '-b', '--budget', help='trade budget (iterations of phase 7)', type=int, default=1000)
+    parser.add_argument(
+        '--samples', help='dealt tables per setting, the mean is reported', type=int, default=3)
+    parser.add_argument(
+        '--seed', help='seed of the first dealt table', type=int, default=0)
+    parser.add_argument(
+        '--no-memory', help='skip the second run of every table under tracemalloc', action='store_true')
+    parser.add_argument(
+        '-o', '--output', help='write results as JSON to this file', type=str)
+
+    return parser
+
+
+def copies(index: int) -> int:
+    # cheaper commodities come in larger sets like in the real decks, every copy of a set is in the stacks
+    return max(2, 9 - index % 9)
+
+
+def required_card_types(cards: int) -> int:
+    card_types = 0
+    while sum(copies(index) for index in range(card_types)) < cards:
+        card_types += 1
+    return card_types
+
+
+def synthetic_game(playercount: int, hand_size: int, card_types: int, trade_engine: str, seed: int,
+                   trade_workers: int = None) -> Game:
+    # bypasses the deck, the configured stacks only exist for 5 to 9 players
+    rng = random.Random(seed)
+    needed = playercount * hand_size
+    if needed > sum(copies(index) for index in range(card_types)):
+        raise ValueError(f'{playercount} hands of {hand_size} cards need {needed} cards, '
+                         f'which takes at least {required_card_types(needed)} commodities instead of {card_types}')
+    game = Game.__new__(Game)
+    game.init_state()
+    game.seed = seed
+    game.rng = random.Random(seed)
+    game.trade_engine = trade_engine
+    game.trade_workers = trade_workers
+
+    # values cycle through 1 to 9, max_count copies of each commodity are shuffled into the stack of its value
+    stacks: Dict[int, List] = {key: [] for key in KEYS}
+    for index in range(card_types):
+        card = game.cards.register(f'commodity_{index}', 1 + index % 9, copies(index), False)
+        stacks[card.value].extend([card] * card.max_count)
+    for cards in stacks.values():
+        rng.shuffle(cards)
+    game.stacks.add_stacks(stacks)
+
+    game.prepare_civilizations([(f'Civilization_{index}', index + 1) for index in range(playercount)])
+    # dealt without replacement, one card per player and turn, every player going through the stacks in turn
+    for turn in range(hand_size):
+        for offset, player in enumerate(game.players):
+            keys = [key for key in KEYS if game.stacks.stacks[key]]
+            player.handcards.append(game.stacks.draw(keys[(turn + offset) % len(keys)]))
+    return game
+
+
+def run_trade_phase(game: Game, budget: int) -> Dict[str, float]:
+    before = sum(evaluate(player.handcards) for player in game.players)
+    VALUATIONS.clear()
+    start = time.perf_counter()
+    with util.muted():
+        iterations = game.phase_7_trade(budget)
+    duration = time.perf_counter() - start
+    return {
+        'duration': duration,
+        'iterations': iterations,
+        'trades': sum(player.trades.get(game.round, 0) for player in game.players),
+        'gain': sum(evaluate(player.handcards) for player in game.players) - before,
+    }
+
+
+def measure_memory(game: Game, budget: int) -> int:
+    # a separate run, tracemalloc slows down every allocation
+    VALUATIONS.clear()
+    tracemalloc.start()
+    try:
+        with util.muted():
+            game.phase_7_trade(budget)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_setting(options: Namespace, playercount: int, hand_size: int, trade_engine: str) -> Dict:
+    runs = []
+    peaks = []
+    for sample in range(options.samples):
+        seed = options.seed + sample
+        runs.append(run_trade_phase(synthetic_game(
+            playercount, hand_size, options.card_types, trade_engine, seed, options.trade_workers), options.budget))
+        if not options.no_memory:
+            # only the game process is traced, the buffer and the workers of the parallel engine are not
+            peaks.append(measure_memory(synthetic_game(
+                playercount, hand_size, options.card_types, trade_engine, seed, options.trade_workers), options.budget))
+
+    result = {
+        'playercount': playercount,
+        'hand_size': hand_size,
+        'card_types': options.card_types,
+        'trade_engine': trade_engine,
+        **{key: sum(run[key] for run in runs) / len(runs) for key in runs[0]},
+        'peak_memory': sum(peaks) / len(peaks) if peaks else None,
+    }
+    result['per_iteration'] = result['duration'] / result['iterations'] if result['iterations'] else None
+    return result
+
+
+def growth(results: List[Dict], key: str, field: str) -> List[Dict]:
+    # exponent k of duration ~ field^k between neighbouring settings that only differ in field
+    exponents = []
+    for first, second in zip(results, results[1:]):
+        same = all(first[other] == second[other] for other in ('playercount', 'hand_size', 'trade_engine')
+                   if other != field)
+        if same and first[key] and second[key] and first[field] != second[field]:
+            exponents.append({
+                'from': first[field], 'to': second[field], 'trade_engine': first['trade_engine'],
+                'playercount': first['playercount'], 'hand_size': first['hand_size'],
+                'exponent': math.log(second[key] / first[key]) / math.log(second[field] / first[field]),
+            })
+    return exponents
+
+
+def main() -> None:
+    options = parse_args().parse_args()
+    # numpy is imported on first use, which should not count for the first table
+    components.trade_matrix.available()
+    # the same commodities for every setting, so that the curves only change with the table
+    if options.card_types is None:
+        options.card_types = required_card_types(max(options.playercounts) * max(options.hand_sizes))
+    elif options.card_types < required_card_types(max(options.playercounts) * max(options.hand_sizes)):
+        print(f'{options.card_types} commodities do not have enough cards for {max(options.playercounts)} hands of '
+              f'{max(options.hand_sizes)} cards, use at least '
+              f'{required_card_types(max(options.playercounts) * max(options.hand_sizes))}.')
+        sys.exit(1)
+    results = []
+    for trade_engine in options.trade_engines:
+        for hand_size in options.hand_sizes:
+            for playercount in options.playercounts:
+                result = run_setting(options, playercount, hand_size, trade_engine)
+                results.append(result)
+                memory = f', peak {result["peak_memory"] / 1024:>9.1f}KiB' if result['peak_memory'] is not None else ''
+                print(f'{trade_engine:<8} {playercount:>4} players, {hand_size:>4} cards: '
+                      f'{result["duration"] * 1000:>10.2f}ms, {result["trades"]:>7.1f} trades in '
+                      f'{result["iterations"]:>7.1f} iterations, gain {result["gain"]:>8.1f}{memory}')
+
+    by_players = growth(results, 'duration', 'playercount')
+    by_hands = growth(sorted(results, key=lambda x: (x['trade_engine'], x['playercount'], x['hand_size'])),
+                      'duration', 'hand_size')
+    for item in by_players:
+        print(f'{item["trade_engine"]:<8} {item["hand_size"]:>4} cards: time ~ players^{item["exponent"]:.2f} '
+              f'from {item["from"]} to {item["to"]} players')
+    for item in by_hands:
+        print(f'{item["trade_engine"]:<8} {item["playercount"]:>4} players: time ~ hand size^{item["exponent"]:.2f} '
+              f'from {item["from"]} to {item["to"]} cards')
+
+    if options.output:
+        Path(options.output).write_text(json.dumps({
+            'results': results, 'growth': {'players': by_players, 'hand_size': by_hands},
+        }, indent=4), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
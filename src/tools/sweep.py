@@ -0,0 +1,139 @@
+from __future__ import annotations
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Dict, List, Tuple
+import json
+import multiprocessing
+import os
+import statistics
+import time
+
+from components.deck import CONFIG_PATH, DeckDefinition, get_deck
+from components.player import evaluate
+from tools.benchmark import deal_game
+import util.texts as util
+
+
+def parse_args() -> ArgumentParser:
+    parser = ArgumentParser(
+        description='Sweep priority thresholds and trade budgets over seeded trade phases')
+    parser.add_argument(
+        '-c', '--config', help='path to the card configuration', type=str,
+        default=str(CONFIG_PATH))
+    parser.add_argument(
+        '-t', '--thresholds', help='priority thresholds to sweep, either a global value like 0.5 '
+        'or per player like Minoa=0.3,Egypt=0.7 (the others keep 0.5)', type=str, nargs='+', default=['0.5'])
+    parser.add_argument(
+        '-b', '--budgets', help='trade budgets (iterations of phase 7) to sweep', type=int, nargs='+', default=[1000])
+    parser.add_argument(
+        '-p', '--playercounts', help='player counts to sweep', type=int, nargs='+', default=[5, 6, 7, 8, 9])
+    parser.add_argument(
+        '-m', '--maps', help='maps to sweep', type=str, nargs='+', default=['west'])
+    parser.add_argument(
+        '--trade-engine', help='trade engine used by phase_7_trade', type=str,
+        choices=['queue', 'matrix', 'matching', 'parallel'], default='queue')
+    parser.add_argument(
+        '--samples', help='number of dealt games per setting', type=int, default=20)
+    parser.add_argument(
+        '--seed', help='seed of the first dealt game', type=int, default=0)
+    parser.add_argument(
+        '--rounds', help='number of dealing rounds before the trade phase', type=int, default=3)
+    parser.add_argument(
+        '--processes', help='number of worker processes', type=int)
+    parser.add_argument(
+        '-o', '--output', help='write the summary as JSON to this file', type=str)
+
+    return parser
+
+
+def parse_threshold(threshold: str) -> Tuple[float, Dict[str, float]]:
+    if '=' not in threshold:
+        return float(threshold), {}
+    thresholds = {}
+    for item in threshold.split(','):
+        name, value = item.split('=')
+        thresholds[name.strip()] = float(value)
+    return 0.5, thresholds
+
+
+def run_trade_phase(job: Tuple[DeckDefinition, Namespace, str, int, int, int]) -> Dict:
+    deck, options, threshold, budget, seed, rounds = job
+    game = deal_game(deck, options, seed, rounds)
+    game.priority_threshold, game.priority_thresholds = parse_threshold(threshold)
+    game.trade_budget = budget
+    before = {player: evaluate(player.handcards) for player in game.players}
+
+    start = time.perf_counter()
+    with util.muted():
+        game.phase_7_trade()
+    duration = time.perf_counter() - start
+
+    return {
+        'setting': (options.playercount, options.map, threshold, budget),
+        'duration': duration,
+        'trades': sum(player.trades.get(game.round, 0) for player in game.players),
+        'gains': {player.name: evaluate(player.handcards) - before[player] for player in game.players},
+    }
+
+
+def describe(values: List[float]) -> Dict[str, float]:
+    return {'mean': statistics.mean(values), 'variance': statistics.pvariance(values)}
+
+
+def aggregate(results: List[Dict]) -> Dict[Tuple[int, str, str, int], Dict]:
+    grouped: Dict[Tuple[int, str, str, int], List[Dict]] = {}
+    for result in results:
+        grouped.setdefault(result['setting'], []).append(result)
+
+    summary = {}
+    for setting, runs in grouped.items():
+        names = list(runs[0]['gains'])
+        summary[setting] = {
+            'samples': len(runs),
+            'gain': describe([sum(run['gains'].values()) for run in runs]),
+            'players': {name: describe([run['gains'][name] for run in runs]) for name in names},
+            'trades': describe([run['trades'] for run in runs]),
+            'duration': describe([run['duration'] for run in runs]),
+        }
+    return summary
+
+
+def run_sweep(options: Namespace) -> Dict[Tuple[int, str, str, int], Dict]:
+    jobs = [
+        (get_deck(playercount, game_map, Path(options.config)),
+         Namespace(playercount=playercount, map=game_map, trade_engine=options.trade_engine),
+         threshold, budget, options.seed + sample, options.rounds)
+        for playercount in options.playercounts
+        for game_map in options.maps
+        for threshold in options.thresholds
+        for budget in options.budgets
+        for sample in range(options.samples)
+    ]
+    with multiprocessing.Pool(options.processes) as pool:
+        chunksize = max(1, len(jobs) // (4 * (options.processes or os.cpu_count() or 1)))
+        results = pool.map(run_trade_phase, jobs, chunksize)
+
+    return aggregate(results)
+
+
+def main() -> None:
+    options = parse_args().parse_args()
+    summary = run_sweep(options)
+
+    for (playercount, game_map, threshold, budget), result in summary.items():
+        print(f'{playercount} players, {game_map} map, threshold {threshold}, budget {budget}: '
+              f'gain {result["gain"]["mean"]:.1f} (var {result["gain"]["variance"]:.1f}), '
+              f'{result["trades"]["mean"]:.1f} trades (var {result["trades"]["variance"]:.1f}), '
+              f'{result["duration"]["mean"] * 1000:.2f}ms (var {result["duration"]["variance"] * 1e6:.3f}ms²)')
+        for name, gain in result['players'].items():
+            print(f'    {name:<10} gain {gain["mean"]:>7.2f} (var {gain["variance"]:.2f})')
+
+    if options.output:
+        Path(options.output).write_text(json.dumps([
+            {'playercount': playercount, 'map': game_map, 'threshold': threshold, 'budget': budget, **result}
+            for (playercount, game_map, threshold, budget), result in summary.items()
+        ], indent=4), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Tuple
+import atexit
+import json
+import queue
+import threading
+
+if TYPE_CHECKING:
+    import sqlite3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    game INTEGER,
+    round INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    actor TEXT,
+    other TEXT,
+    gained TEXT,
+    given TEXT,
+    actor_before INTEGER,
+    actor_after INTEGER,
+    other_before INTEGER,
+    other_after INTEGER,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_game_round ON events (game, round);
+'''
+
+INSERT = 'INSERT INTO events (game, round, kind, actor, other, gained, given, actor_before, actor_after, ' \
+    'other_before, other_after, detail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+# game, round, kind, actor, other, gained, given, actor_before, actor_after, other_before, other_after, detail
+Event = Tuple[int, int, str, str, str, Tuple[str, ...], Tuple[str, ...], int, int, int, int, str]
+
+
+class EventLog():
+    # events are collected on the game thread and inserted in one transaction per batch in the background
+    def __init__(self, path: Path, batch_size: int = 1000) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.pending: List[Event] = []
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: threading.Thread = None
+        # events below a full batch are still written when the game ends
+        atexit.register(self.close)
+
+    def emit(self, event: Event) -> None:
+        self.pending.append(event)
+        if len(self.pending) >= self.batch_size:
+            self.submit()
+
+    def submit(self) -> None:
+        if not self.pending:
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run, name='events', daemon=True)
+            self.thread.start()
+        self.queue.put(self.pending)
+        self.pending = []
+
+    def run(self) -> None:
+        connection = None
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                if connection is None:
+                    connection = self.connect()
+                with connection:
+                    connection.executemany(INSERT, [row(event) for event in batch])
+            except Exception as error:  # pylint: disable=W0703
+                # the thread has to survive, flush waits for every batch
+                print(f'Writing events failed: {error}')
+            finally:
+                self.queue.task_done()
+                if batch is None and connection is not None:
+                    connection.close()
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite3 is only imported when events are written, like numpy for the matrix engine
+        import sqlite3  # pylint: disable=C0415
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # simulation workers share the database, a generous timeout lets them take turns
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def flush(self) -> None:
+        self.submit()
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self) -> None:
+        self.submit()
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+def row(event: Event) -> Tuple:
+    # card names are stored as json lists
+    event = list(event)
+    for index in (5, 6):
+        if event[index] is not None:
+            event[index] = json.dumps(event[index])
+    return tuple(event)
+
+
+LOG: EventLog = None
+
+
+def configure(path: Path, batch_size: int = 1000) -> EventLog:
+    global LOG  # pylint: disable=W0603
+    if LOG is not None:
+        LOG.close()
+    LOG = EventLog(path, batch_size)
+    return LOG
+
+
+def names(cards: Iterable) -> Tuple[str, ...]:
+    return tuple(card.name for card in cards)
+
+
+def emit(game: int, game_round: int, kind: str, actor: str, other: str = None, gained: Iterable = None,
+         given: Iterable = None, values: Tuple[int, int, int, int] = (None, None, None, None),
+         detail: str = None) -> None:
+    # does nothing unless an event log is configured
+    if LOG is None:
+        return
+    LOG.emit((game, game_round, kind, actor, other,
+              names(gained) if gained is not None else None, names(given) if given is not None else None,
+              *values, detail))
+
+
+def flush() -> None:
+    if LOG is not None:
+        LOG.flush()
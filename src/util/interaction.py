@@ -1,15 +1,116 @@
-from typing import Tuple, List
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Tuple, List
+import time
 
 import util.texts as util
-from components.player import Player
+import util.profiling as profiling
+import util.replay as replay
+
+if TYPE_CHECKING:
+    from components.card import Card
+    from components.game import Game
+    from components.player import Player
+
+
+class ScriptFinished(Exception):
+    pass
+
+
+class InputProvider(ABC):
+    # answers the questions of a game, the decisions below default to asking them as text
+    name = None
+    # whether someone at the table needs the game to wait for the physical board
+    waits = True
+
+    @abstractmethod
+    def get_input(self, request: str) -> str:
+        pass
+
+    def wait_for_action(self, text: str) -> str:
+        return self.get_input(text)
+
+    def cities(self, game: Game, player: Player) -> int:  # pylint: disable=W0613
+        return get_digit(f'{player.name}:')
+
+    def purchase(self, game: Game, player: Player, options: List[int]) -> int:
+        util.info(f'{player.name}:')
+        value = get_digit(
+            f'{game.trailing_str}Please type value of card that you want to purchase.\nValid options: {options}')
+        return value if value != 0 else None
+
+    def prevented_banditry(self, game: Game, player: Player) -> int:  # pylint: disable=W0613
+        return get_digit('How many cards do you want to prevent?\n')
+
+    def corruption_face_value(self, game: Game, player: Player) -> int:  # pylint: disable=W0613
+        return get_digit(
+            'Please type in actual face value to discard. Base:10, Law:-5, Coinage:+5, Wonder of the World:+5\n')
+
+    def discard_cards(self, game: Game, player: Player, cards: List[Card], preceding_str: str = '',
+                      count: int = None, face_value: int = None) -> None:  # pylint: disable=W0613
+        # count and face value are what is still missing, neither is given for voluntary discards
+        player.discard_cards(cards, preceding_str)
+
+    def discard_more(self, game: Game, player: Player, request: str) -> bool:  # pylint: disable=W0613
+        return get_confirmation(request)
+
+
+class InteractiveProvider(InputProvider):
+    name = 'interactive'
+
+    def get_input(self, request: str) -> str:
+        return input(util.format_action(request))
+
+    def wait_for_action(self, text: str) -> str:
+        return input(util.format_waiting(text))
+
+
+class ScriptedProvider(InputProvider):
+    # answers are read line by line, nobody is at the table to wait for
+    name = 'scripted'
+    waits = False
+
+    def __init__(self, answers: List[str]) -> None:
+        self.answers = answers
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path: Path) -> ScriptedProvider:
+        return cls(path.read_text(encoding='utf-8').splitlines())
+
+    def get_input(self, request: str) -> str:
+        if self.position >= len(self.answers):
+            raise ScriptFinished(f'script ran out of answers at: {request.strip()}')
+        self.position += 1
+        return self.answers[self.position - 1]
+
+
+PROVIDER: InputProvider = InteractiveProvider()
+
+
+def use(provider: InputProvider) -> InputProvider:
+    global PROVIDER  # pylint: disable=W0603
+    PROVIDER = provider
+    return PROVIDER
 
 
 def get_input(request: str) -> str:
-    return input(util.format_action(request))
+    # everything buffered so far belongs in front of the question
+    util.flush()
+    start = time.perf_counter()
+    user_input = replay.answer('input', lambda: PROVIDER.get_input(request))
+    profiling.PROFILER.add_time('waiting for input', time.perf_counter() - start)
+    return user_input
 
 
 def wait_for_action(text: str) -> None:
-    input(util.format_waiting(text))
+    if not PROVIDER.waits:
+        return
+    util.flush()
+    start = time.perf_counter()
+    replay.answer('wait', lambda: PROVIDER.wait_for_action(text))
+    profiling.PROFILER.add_time('waiting for input', time.perf_counter() - start)
 
 
 def get_digit(request: str) -> int:
@@ -0,0 +1,84 @@
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator
+import cProfile
+import time
+
+import util.texts as util
+
+
+class Profiler():
+    enabled = True
+
+    def __init__(self, output: str = None) -> None:
+        self.output = output
+        self.profile = cProfile.Profile() if output else None
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.round_start = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(
+                name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def start_round(self) -> None:
+        self.phases = {}
+        self.counters = {}
+        self.round_start = time.perf_counter()
+        if self.profile is not None:
+            self.profile.enable()
+
+    def end_round(self, game_round: int) -> None:
+        duration = time.perf_counter() - self.round_start
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.output)
+        # asked for explicitly, so it is printed whatever the verbosity, after the buffered output of the round
+        util.flush()
+        print(util.format_game_info(self.summary(game_round, duration)))
+
+    def summary(self, game_round: int, duration: float) -> str:
+        text = f'PROFILE: round {game_round} took {duration:.3f}s\n'
+        for name, seconds in self.phases.items():
+            text += f'  {name:<45} {seconds:>9.3f}s\n'
+        for name, amount in self.counters.items():
+            text += f'  {name:<45} {amount:>9}\n'
+        return text
+
+
+class NullProfiler(Profiler):
+    enabled = False
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return nullcontext()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def add_time(self, name: str, seconds: float) -> None:
+        pass
+
+    def start_round(self) -> None:
+        pass
+
+    def end_round(self, game_round: int) -> None:
+        pass
+
+
+PROFILER: Profiler = NullProfiler()
+
+
+def enable(output: str = None) -> Profiler:
+    global PROFILER  # pylint: disable=W0603
+    PROFILER = Profiler(output)
+    return PROFILER
@@ -0,0 +1,74 @@
+from pathlib import Path
+from typing import Callable, Dict, List
+import atexit
+import json
+
+FORMAT = 1
+
+
+class ReplayFinished(Exception):
+    pass
+
+
+class Recorder():
+    # one json line per answer, flushed right away so an interrupted game can still be replayed
+    def __init__(self, path: Path, header: Dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, 'w', encoding='utf-8')  # pylint: disable=R1732
+        self.write({'format': FORMAT, **header})
+        atexit.register(self.close)
+
+    def write(self, item) -> None:
+        self.file.write(json.dumps(item) + '\n')
+        self.file.flush()
+
+    def record(self, kind: str, value: str) -> None:
+        self.write([kind, value])
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class Replay():
+    def __init__(self, path: Path) -> None:
+        lines = path.read_text(encoding='utf-8').splitlines()
+        self.header: Dict = json.loads(lines[0])
+        if self.header.get('format', 0) > FORMAT:
+            raise ValueError(
+                f'replay format {self.header["format"]} is newer than the supported format {FORMAT}')
+        self.answers: List[List[str]] = [json.loads(line) for line in lines[1:] if line]
+        self.position = 0
+
+    def next(self, kind: str) -> str:
+        if self.position >= len(self.answers):
+            raise ReplayFinished(f'replayed all {len(self.answers)} answers')
+        recorded_kind, value = self.answers[self.position]
+        if recorded_kind != kind:
+            raise ValueError(
+                f'replay out of sync at answer {self.position + 1}: recorded {recorded_kind}, game asked for {kind}')
+        self.position += 1
+        return value
+
+
+RECORDER: Recorder = None
+REPLAY: Replay = None
+
+
+def record(path: Path, header: Dict) -> Recorder:
+    global RECORDER  # pylint: disable=W0603
+    RECORDER = Recorder(path, header)
+    return RECORDER
+
+
+def replay(path: Path) -> Replay:
+    global REPLAY  # pylint: disable=W0603
+    REPLAY = Replay(path)
+    return REPLAY
+
+
+def answer(kind: str, ask: Callable[[], str]) -> str:
+    # answers come from the replay if one is loaded, and are recorded if a recorder is set up
+    value = REPLAY.next(kind) if REPLAY is not None else ask()
+    if RECORDER is not None:
+        RECORDER.record(kind, value)
+    return value
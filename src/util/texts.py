@@ -1,17 +1,117 @@
-from colorama import Fore, Style
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, TextIO
+import atexit
+import sys
+
+# verbosity levels, a sink writes every text up to its level
+GAME_INFO = 1
+INFO = 2
+ACTION = 3
+LEVELS = {'game_info': GAME_INFO, 'info': INFO, 'action': ACTION}
+
+
+def colors():
+    # colorama is imported with the first formatted text, headless runs never need it
+    from colorama import Fore, Style  # pylint: disable=C0415
+    return Fore, Style
 
 
 def format_game_info(text: str) -> str:
-    return f'{Fore.YELLOW}{text}{Style.RESET_ALL}'
+    fore, style = colors()
+    return f'{fore.YELLOW}{text}{style.RESET_ALL}'
 
 
 def format_info(text: str) -> str:
-    return f'{Fore.WHITE}{text}{Style.RESET_ALL}'
+    fore, style = colors()
+    return f'{fore.WHITE}{text}{style.RESET_ALL}'
 
 
 def format_action(text: str) -> str:
-    return f'{Fore.GREEN}{text}{Style.RESET_ALL}'
+    fore, style = colors()
+    return f'{fore.GREEN}{text}{style.RESET_ALL}'
 
 
 def format_waiting(text: str) -> str:
-    return f'{Fore.LIGHTRED_EX}{text}{Style.RESET_ALL}'
+    fore, style = colors()
+    return f'{fore.LIGHTRED_EX}{text}{style.RESET_ALL}'
+
+
+class Sink():
+    # collects the lines of a phase and writes them at once, flushed before every question
+    def __init__(self, level: int = ACTION, stream: TextIO = None) -> None:
+        self.level = level
+        self.stream = stream
+        self.lines: List[str] = []
+
+    def enabled(self, level: int) -> bool:
+        return level <= self.level
+
+    def write(self, level: int, text: str, formatter: Callable[[str], str] = None) -> None:
+        if level <= self.level:
+            self.lines.append(formatter(text) if formatter is not None else text)
+
+    def flush(self) -> None:
+        if not self.lines:
+            return
+        # resolved on every flush, so redirected output is respected
+        stream = self.stream or sys.stdout
+        stream.write('\n'.join(self.lines) + '\n')
+        stream.flush()
+        self.lines = []
+
+
+class NullSink(Sink):
+    # drops everything before it is formatted
+    def __init__(self) -> None:
+        super().__init__(level=0)
+
+    def write(self, level: int, text: str, formatter: Callable[[str], str] = None) -> None:
+        pass
+
+
+SINK: Sink = Sink()
+
+
+def use(sink: Sink) -> Sink:
+    global SINK  # pylint: disable=W0603
+    SINK.flush()
+    SINK = sink
+    return SINK
+
+
+@contextmanager
+def muted() -> Iterator[None]:
+    # batch runs skip formatting and writing altogether
+    previous = SINK
+    use(NullSink())
+    try:
+        yield
+    finally:
+        use(previous)
+
+
+def enabled(level: int) -> bool:
+    return SINK.enabled(level)
+
+
+def write(level: int, text: str) -> None:
+    SINK.write(level, text)
+
+
+def game_info(text: str) -> None:
+    SINK.write(GAME_INFO, text, format_game_info)
+
+
+def info(text: str) -> None:
+    SINK.write(INFO, text, format_info)
+
+
+def action(text: str) -> None:
+    SINK.write(ACTION, text, format_action)
+
+
+def flush() -> None:
+    SINK.flush()
+
+
+atexit.register(flush)